@@ -7,6 +7,37 @@ class Settings(BaseSettings):
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
 
+    # Verified JWT payloads, so repeated tokens skip signature checks
+    TOKEN_CACHE_SIZE: int = 4096
+    TOKEN_CACHE_TTL_SECONDS: int = 300
+
+    # In-process cache of authenticated users (see app.database.get_current_user)
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL_SECONDS: int = 60
+
+    # Resolve the user id from the token itself instead of the users table
+    AUTH_STATELESS: bool = False
+    REVOCATION_REFRESH_SECONDS: int = 30
+
+    # bcrypt runs off the event loop on a "thread" or "process" pool
+    PASSWORD_HASH_EXECUTOR: str = "thread"
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+
+    # First responses to POSTs with an Idempotency-Key, replayed on retries
+    IDEMPOTENCY_CACHE_SIZE: int = 10000
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+
+    # Optional write-behind buffer for logged sets (app.write_behind)
+    SET_WRITE_BEHIND: bool = False
+    SET_WRITE_BEHIND_FLUSH_MS: int = 200
+    SET_WRITE_BEHIND_MAX_ROWS: int = 100
+    SET_WRITE_BEHIND_DURABILITY: str = "flush"
+    SET_WRITE_BEHIND_ID_BLOCK_SIZE: int = 100
+
+    # Rows fetched per query while streaming GET /export
+    EXPORT_CHUNK_SIZE: int = 1000
+
     class Config:
         env_file = ".env"
 
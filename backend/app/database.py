@@ -1,4 +1,10 @@
-from app.auth import decode_access_token
+import asyncio
+import time
+from typing import Dict, Optional
+
+from app.auth import Principal, decode_access_token
+from app.cache import LRUCache
+from app.config import settings
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials
@@ -7,6 +13,64 @@ from prisma import Prisma
 prisma = Prisma()
 security = HTTPBearer()
 
+# Users resolved from bearer tokens, keyed by username
+user_cache = LRUCache(
+    maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS
+)
+
+
+def invalidate_cached_user(username: str):
+    """Drop a user from the principal cache; call when a user is created or deleted."""
+    user_cache.invalidate(username)
+
+
+class RevocationList:
+    """Deny list for stateless tokens.
+
+    Maps user id to the lowest token version still accepted for that user. It
+    is reloaded from ``users.tokenVersion`` at most every ``refresh_seconds``,
+    and updated immediately in this process when a user revokes their tokens.
+    """
+
+    def __init__(self, refresh_seconds: int):
+        self.refresh_seconds = refresh_seconds
+        self._min_versions: Dict[int, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+
+    def _is_stale(self) -> bool:
+        return (
+            self._loaded_at is None
+            or time.monotonic() - self._loaded_at >= self.refresh_seconds
+        )
+
+    async def refresh_if_stale(self, db: Prisma):
+        if not self._is_stale():
+            return
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self._is_stale():
+                return
+            rows = await db.query_raw(
+                'SELECT "id", "tokenVersion" FROM "users" WHERE "tokenVersion" > 0'
+            )
+            self._min_versions = {row["id"]: row["tokenVersion"] for row in rows}
+            self._loaded_at = time.monotonic()
+
+    def revoke(self, user_id: int, min_version: int):
+        self._min_versions[user_id] = min_version
+
+    def is_revoked(self, user_id: int, version: int) -> bool:
+        return version < self._min_versions.get(user_id, 0)
+
+    def stats(self) -> dict:
+        return {"entries": len(self._min_versions)}
+
+
+revocation_list = RevocationList(refresh_seconds=settings.REVOCATION_REFRESH_SECONDS)
+
 
 async def get_db():
     if not prisma.is_connected():
@@ -14,34 +78,52 @@ async def get_db():
     return prisma
 
 
-async def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Prisma = Depends(get_db),
-):
-    token = credentials.credentials
-    payload = decode_access_token(token)
+def _credentials_error(detail: str = "Could not validate credentials") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
 
+async def authenticate_token(token: str, db: Prisma):
+    """Resolve a bearer token to the current user or raise 401.
+
+    With ``AUTH_STATELESS`` enabled, tokens carrying a user id resolve to a
+    ``Principal`` without touching the database (apart from the periodic
+    revocation list refresh). Otherwise the user row is loaded, via the cache.
+    """
+    payload = decode_access_token(token)
     if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _credentials_error()
 
     username: str = payload.get("sub")
     if username is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _credentials_error()
 
-    user = await db.user.find_unique(where={"username": username})
+    version: int = payload.get("ver", 0)
+    user_id: Optional[int] = payload.get("uid")
+    if settings.AUTH_STATELESS and user_id is not None:
+        await revocation_list.refresh_if_stale(db)
+        if revocation_list.is_revoked(user_id, version):
+            raise _credentials_error("Token has been revoked")
+        return Principal(id=user_id, username=username)
+
+    user = user_cache.get(username)
     if user is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="User not found",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        user = await db.user.find_unique(where={"username": username})
+        if user is None:
+            raise _credentials_error("User not found")
+        user_cache.set(username, user)
+
+    if version < user.tokenVersion:
+        raise _credentials_error("Token has been revoked")
 
     return user
+
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: Prisma = Depends(get_db),
+):
+    return await authenticate_token(credentials.credentials, db)
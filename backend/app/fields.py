@@ -0,0 +1,107 @@
+"""Sparse fieldsets (``?fields=id,name,exercise.name``) for list endpoints.
+
+Prisma Client Python selects exactly the fields declared on the model class a
+query runs through, which is how generated partial types work. A requested
+field set is turned into such a partial model at runtime, so only those
+columns are fetched from the database.
+"""
+from functools import lru_cache
+from typing import FrozenSet, Iterable, Optional, Tuple, Type, get_args
+
+from fastapi import HTTPException, status
+from prisma import bases
+from pydantic import BaseModel, create_model
+
+
+def _related_type(annotation) -> Optional[type]:
+    """The model class inside ``Optional[Model]`` / ``List[Model]``, if any."""
+    candidates = get_args(annotation) or (annotation,)
+    for candidate in candidates:
+        if isinstance(candidate, type) and issubclass(candidate, BaseModel):
+            return candidate
+        nested = _related_type(candidate) if get_args(candidate) else None
+        if nested is not None:
+            return nested
+    return None
+
+
+def parse_fields(
+    fields: Optional[str],
+    response_model: Type[BaseModel],
+    always: Iterable[str] = ("id",),
+) -> Optional[FrozenSet[str]]:
+    """Validate a ``fields`` query parameter against a response schema.
+
+    Returns the requested field paths plus ``always``, or None when the
+    parameter was not given (meaning every field).
+    """
+    if fields is None:
+        return None
+
+    requested = frozenset(name.strip() for name in fields.split(",") if name.strip())
+    unknown = []
+    for path in requested:
+        head, _, rest = path.partition(".")
+        info = response_model.model_fields.get(head)
+        nested = _related_type(info.annotation) if info else None
+        if info is None or (rest and (nested is None or rest not in nested.model_fields)):
+            unknown.append(path)
+
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(sorted(unknown))}",
+        )
+    return requested | frozenset(always)
+
+
+@lru_cache(maxsize=256)
+def _partial_model(
+    model: Type[BaseModel],
+    columns: FrozenSet[str],
+    relations: Tuple[Tuple[str, type], ...],
+) -> Type[BaseModel]:
+    definitions = {
+        name: (Optional[model.model_fields[name].annotation], None)
+        for name in sorted(columns)
+    }
+    for name, related in relations:
+        definitions[name] = (Optional[related], None)
+
+    base = getattr(bases, f"Base{model.__prisma_model__}")
+    return create_model(f"{model.__name__}Partial", __base__=base, **definitions)
+
+
+def select_model(
+    model: Type[BaseModel], selected: FrozenSet[str]
+) -> Tuple[Type[BaseModel], Optional[dict]]:
+    """Partial model of the Prisma ``model`` restricted to ``selected`` paths,
+    and the ``include`` argument its relations need.
+
+    A bare relation name (``exercise``) selects all of that relation's columns;
+    ``exercise.name`` selects just that one (plus its ``id``).
+    """
+    columns = set()
+    nested = {}
+    for path in selected:
+        head, _, rest = path.partition(".")
+        related = _related_type(model.model_fields[head].annotation)
+        if related is None or not hasattr(related, "__prisma_model__"):
+            columns.add(head)
+        elif rest:
+            nested.setdefault(head, {"id"}).add(rest)
+        else:
+            nested[head] = {
+                name
+                for name, info in related.model_fields.items()
+                if not hasattr(_related_type(info.annotation), "__prisma_model__")
+            }
+
+    relations = []
+    for name, related_columns in sorted(nested.items()):
+        related = _related_type(model.model_fields[name].annotation)
+        relations.append((name, _partial_model(related, frozenset(related_columns), ())))
+
+    partial = _partial_model(model, frozenset(columns), tuple(relations))
+    include = {name: True for name in nested} or None
+    return partial, include
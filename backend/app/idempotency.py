@@ -0,0 +1,198 @@
+import hashlib
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Optional, Set, Tuple
+
+from app.cache import LRUCache
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    status: int
+    headers: List[Tuple[bytes, bytes]]
+    body: bytes
+    # Hash of the request body that produced this response
+    fingerprint: str = ""
+
+
+class IdempotencyStore(ABC):
+    """Where first responses are kept. Subclass to share them between instances
+    (e.g. in Redis); the default keeps them in process memory."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        ...
+
+    @abstractmethod
+    async def put(self, key: str, response: StoredResponse):
+        ...
+
+    @abstractmethod
+    async def acquire(self, key: str) -> bool:
+        """Mark ``key`` in flight; False if another request holds it."""
+
+    @abstractmethod
+    async def release(self, key: str):
+        ...
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryIdempotencyStore(IdempotencyStore):
+    def __init__(self, maxsize: int, ttl: float):
+        self._responses = LRUCache(maxsize=maxsize, ttl=ttl)
+        self._in_flight: Set[str] = set()
+        self.conflicts = 0
+
+    async def get(self, key: str) -> Optional[StoredResponse]:
+        return self._responses.get(key)
+
+    async def put(self, key: str, response: StoredResponse):
+        self._responses.set(key, response)
+
+    async def acquire(self, key: str) -> bool:
+        if key in self._in_flight:
+            self.conflicts += 1
+            return False
+        self._in_flight.add(key)
+        return True
+
+    async def release(self, key: str):
+        self._in_flight.discard(key)
+
+    def stats(self) -> dict:
+        # Cache hits are replayed responses
+        return {
+            **self._responses.stats(),
+            "in_flight": len(self._in_flight),
+            "conflicts": self.conflicts,
+        }
+
+
+class IdempotencyMiddleware:
+    """Replay the first response to a POST carrying an ``Idempotency-Key``.
+
+    Keys are scoped to the caller's Authorization header and the request path,
+    so clients cannot collide with each other; requests without credentials
+    (login, register) are never replayed. A retry whose body differs from the
+    stored request gets ``422``, and a duplicate arriving while the first
+    request is still running gets ``409``. Server errors (5xx) are not stored,
+    so the client can retry them.
+    """
+
+    def __init__(self, app, store: IdempotencyStore):
+        self.app = app
+        self.store = store
+
+    def _key(self, authorization: bytes, path: str, idempotency_key: bytes) -> str:
+        digest = hashlib.sha256()
+        for part in (authorization, path.encode(), idempotency_key):
+            digest.update(part + b"\0")
+        return digest.hexdigest()
+
+    async def _read_body(self, receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        idempotency_key = headers.get(IDEMPOTENCY_HEADER.lower().encode())
+        authorization = headers.get(b"authorization")
+        if not idempotency_key or not authorization:
+            await self.app(scope, receive, send)
+            return
+
+        # The body is read up front to fingerprint it, then handed to the app
+        body = await self._read_body(receive)
+        fingerprint = hashlib.sha256(body).hexdigest()
+        body_sent = False
+
+        async def replay_body():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        key = self._key(authorization, scope["path"], idempotency_key)
+        stored = await self.store.get(key)
+        if stored is not None:
+            if stored.fingerprint != fingerprint:
+                await self._send(
+                    send,
+                    StoredResponse(
+                        status=422,
+                        headers=[(b"content-type", b"application/json")],
+                        body=b'{"detail":"Idempotency-Key was used with a different '
+                        b'request body"}',
+                    ),
+                )
+                return
+            await self._send(send, stored, replayed=True)
+            return
+
+        if not await self.store.acquire(key):
+            await self._send(
+                send,
+                StoredResponse(
+                    status=409,
+                    headers=[(b"content-type", b"application/json")],
+                    body=b'{"detail":"A request with this Idempotency-Key is in progress"}',
+                ),
+            )
+            return
+
+        try:
+            start = {}
+            chunks = []
+
+            async def capture(message):
+                if message["type"] == "http.response.start":
+                    start.update(message)
+                elif message["type"] == "http.response.body":
+                    chunks.append(message.get("body", b""))
+                await send(message)
+
+            await self.app(scope, replay_body, capture)
+
+            if start and start["status"] < 500:
+                await self.store.put(
+                    key,
+                    StoredResponse(
+                        status=start["status"],
+                        headers=list(start.get("headers", [])),
+                        body=b"".join(chunks),
+                        fingerprint=fingerprint,
+                    ),
+                )
+        finally:
+            await self.store.release(key)
+
+    async def _send(self, send, response: StoredResponse, replayed: bool = False):
+        headers = [
+            (name, value)
+            for name, value in response.headers
+            if name.lower() != b"content-length"
+        ]
+        headers.append((b"content-length", str(len(response.body)).encode()))
+        if replayed:
+            headers.append((REPLAYED_HEADER.lower().encode(), b"true"))
+        await send(
+            {"type": "http.response.start", "status": response.status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": response.body})
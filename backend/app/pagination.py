@@ -0,0 +1,81 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from fastapi import HTTPException, Response, status
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# List endpoints keep returning a plain JSON array; the cursor for the next
+# page travels in this response header and is absent on the last page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    encoded = [
+        {"dt": value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(encoded).encode()).decode()
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError(cursor)
+        return [
+            datetime.fromisoformat(value["dt"]) if isinstance(value, dict) else value
+            for value in values
+        ]
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor"
+        )
+
+
+def _keyset_where(fields: Sequence[str], values: Sequence[Any], op: str) -> dict:
+    """Rows strictly after ``values`` in ``fields`` order, e.g. for (timestamp, id):
+    timestamp > t OR (timestamp = t AND id > i)."""
+    branches = []
+    for i, field in enumerate(fields):
+        branch = {fields[j]: values[j] for j in range(i)}
+        branch[field] = {op: values[i]}
+        branches.append(branch)
+    return branches[0] if len(branches) == 1 else {"OR": branches}
+
+
+async def paginate(
+    delegate,
+    response: Response,
+    where: dict,
+    limit: int,
+    cursor: Optional[str],
+    order_by: Sequence[str] = ("id",),
+    descending: bool = False,
+    **kwargs,
+):
+    """Keyset-paginated ``find_many`` ordered by ``order_by`` (which must end in a
+    unique column). Sets the next-page cursor header when more rows exist."""
+    if cursor:
+        values = decode_cursor(cursor, len(order_by))
+        op = "lt" if descending else "gt"
+        where = {"AND": [where, _keyset_where(order_by, values, op)]}
+
+    direction = "desc" if descending else "asc"
+    rows = await delegate.find_many(
+        where=where,
+        order=[{field: direction} for field in order_by],
+        take=limit + 1,
+        **kwargs,
+    )
+
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(
+            [getattr(rows[-1], field) for field in order_by]
+        )
+    return rows
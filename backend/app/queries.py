@@ -0,0 +1,89 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Type, TypeVar
+
+from prisma import Prisma
+from pydantic import BaseModel
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+# SQL expression compared against the current user id in ownership predicates
+OWNER_COLUMN = '"userId"'
+
+
+def placeholder(index: int, value: Any) -> str:
+    """Positional parameter for a raw query, cast where Postgres cannot infer it.
+
+    Raw query arguments are sent to the engine as JSON, so timestamps arrive as
+    text and need an explicit cast.
+    """
+    if isinstance(value, datetime):
+        return f"${index}::timestamp"
+    return f"${index}"
+
+
+async def update_owned(
+    db: Prisma,
+    model: Type[ModelT],
+    table: str,
+    record_id: int,
+    user_id: int,
+    data: Dict[str, Any],
+    owner: str = OWNER_COLUMN,
+) -> Optional[ModelT]:
+    """Update a row only if it belongs to ``user_id``, in a single statement.
+
+    ``owner`` is the SQL expression holding the row's owner id. Returns the
+    updated record, or None when no row matched (missing or not owned).
+    """
+    args = []
+    assignments = []
+    for column, value in data.items():
+        args.append(value)
+        assignments.append(f'"{column}" = {placeholder(len(args), value)}')
+    # @updatedAt is maintained by the Prisma client, not the database
+    assignments.append("\"updatedAt\" = (NOW() AT TIME ZONE 'UTC')")
+
+    args.extend([record_id, user_id])
+    query = (
+        f'UPDATE "{table}" SET {", ".join(assignments)} '
+        f'WHERE "id" = ${len(args) - 1} AND {owner} = ${len(args)} '
+        "RETURNING *"
+    )
+    return await db.query_first(query, *args, model=model)
+
+
+async def delete_owned(
+    db: Prisma,
+    model: Type[ModelT],
+    table: str,
+    record_id: int,
+    user_id: int,
+    owner: str = OWNER_COLUMN,
+) -> Optional[ModelT]:
+    """Delete a row only if it belongs to ``user_id``, in a single statement.
+
+    Returns the deleted record, or None when no row matched (missing or not
+    owned). Use instead of ``delete_many`` when the caller needs the row.
+    """
+    return await db.query_first(
+        f'DELETE FROM "{table}" WHERE "id" = $1 AND {owner} = $2 RETURNING *',
+        record_id,
+        user_id,
+        model=model,
+    )
+
+
+async def reserve_ids(db: Prisma, table: str, count: int) -> List[int]:
+    """Draw ``count`` ids from ``table``'s id sequence in one statement.
+
+    Lets parent rows be bulk-inserted with ``create_many`` using known ids, so
+    their children can reference them without reading the parents back.
+    """
+    if count <= 0:
+        return []
+    rows = await db.query_raw(
+        f"SELECT nextval(pg_get_serial_sequence('\"{table}\"', 'id'))::int AS id "
+        "FROM generate_series(1, $1::int)",
+        count,
+    )
+    return [row["id"] for row in rows]
@@ -0,0 +1,123 @@
+"""Personal records per user and exercise (``personal_records``).
+
+One row per weight ever lifted, holding the most reps done with it. The
+heaviest set and the best estimated 1RM are both derived from these rows, so
+reading a user's PRs never touches ``training_exercises``. New sets can only
+raise a record, so they are merged in directly; updated or deleted sets
+trigger a recompute of the affected exercises. To rebuild every row:
+
+    python -m app.records rebuild
+"""
+import asyncio
+import sys
+from datetime import timedelta
+from typing import Iterable, Sequence
+
+from prisma import Prisma
+
+# Best set per (user, exercise, weight): most reps, earliest on ties
+_INSERT_BEST_SETS = """
+    INSERT INTO "personal_records" ("userId", "exerciseId", "kgs", "reps", "achievedAt")
+    SELECT DISTINCT ON (te."userId", pe."exerciseId", te."kgs")
+        te."userId", pe."exerciseId", te."kgs", te."reps", te."timestamp"
+    FROM "training_exercises" AS te
+    JOIN "plan_exercises" AS pe ON pe."id" = te."planExerciseId"
+    WHERE {where}
+    ORDER BY te."userId", pe."exerciseId", te."kgs", te."reps" DESC, te."timestamp"
+"""
+
+
+def estimated_1rm(kgs: float, reps: int) -> float:
+    """Epley estimate; a single is its own 1RM (same as rollups.ESTIMATED_1RM_SQL)."""
+    return kgs if reps == 1 else kgs * (1 + reps / 30.0)
+
+
+async def add_sets(db: Prisma, set_ids: Sequence[int]):
+    """Merge newly inserted sets into the records, in one statement."""
+    if not set_ids:
+        return
+    placeholders = ", ".join(f"${i}" for i in range(1, len(set_ids) + 1))
+    where = f'te."id" IN ({placeholders}) AND te."userId" IS NOT NULL'
+    await db.execute_raw(
+        _INSERT_BEST_SETS.format(where=where)
+        + """
+        ON CONFLICT ("userId", "exerciseId", "kgs") DO UPDATE SET
+            "reps" = EXCLUDED."reps",
+            "achievedAt" = EXCLUDED."achievedAt"
+        WHERE EXCLUDED."reps" > "personal_records"."reps"
+        """,
+        *set_ids,
+    )
+
+
+async def refresh(db: Prisma, user_id: int, plan_exercise_ids: Iterable[int]):
+    """Recompute the user's records for the exercises behind ``plan_exercise_ids``,
+    e.g. after one of their sets was updated or deleted."""
+    plan_exercise_ids = sorted(set(plan_exercise_ids))
+    if not plan_exercise_ids:
+        return
+
+    placeholders = ", ".join(f"${i}" for i in range(2, len(plan_exercise_ids) + 2))
+    await _recompute(
+        db,
+        f'SELECT "exerciseId" FROM "plan_exercises" WHERE "id" IN ({placeholders})',
+        [user_id, *plan_exercise_ids],
+    )
+
+
+async def refresh_exercises(db: Prisma, user_id: int, exercise_ids: Iterable[int]):
+    """Recompute the user's records for ``exercise_ids``, e.g. after a cascade
+    delete removed plan exercises along with their sets."""
+    exercise_ids = sorted(set(exercise_ids))
+    if not exercise_ids:
+        return
+
+    placeholders = ", ".join(f"${i}" for i in range(2, len(exercise_ids) + 2))
+    await _recompute(db, placeholders, [user_id, *exercise_ids])
+
+
+async def _recompute(db: Prisma, exercises: str, args: list):
+    """Replace the records of user ``$1`` for the exercises in ``exercises`` (the
+    contents of an ``IN (...)``) with fresh ones."""
+    async with db.tx() as tx:
+        await tx.execute_raw(
+            f"""
+            DELETE FROM "personal_records"
+            WHERE "userId" = $1 AND "exerciseId" IN ({exercises})
+            """,
+            *args,
+        )
+        await tx.execute_raw(
+            _INSERT_BEST_SETS.format(
+                where=f'te."userId" = $1 AND pe."exerciseId" IN ({exercises})'
+            ),
+            *args,
+        )
+
+
+async def rebuild(db: Prisma):
+    """Recompute every record from ``training_exercises``."""
+    # Scans the whole set table, so allow far more than the default 5s
+    async with db.tx(timeout=timedelta(minutes=30)) as tx:
+        await tx.execute_raw('DELETE FROM "personal_records"')
+        return await tx.execute_raw(
+            _INSERT_BEST_SETS.format(where='te."userId" IS NOT NULL')
+        )
+
+
+async def main(argv):
+    if argv[1:] != ["rebuild"]:
+        print("usage: python -m app.records rebuild")
+        sys.exit(2)
+
+    db = Prisma()
+    await db.connect()
+    try:
+        count = await rebuild(db)
+    finally:
+        await db.disconnect()
+    print(f"Rebuilt {count} personal records")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv))
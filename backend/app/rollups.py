@@ -0,0 +1,190 @@
+"""Daily per-exercise rollups of logged sets (``exercise_daily_rollups``).
+
+New sets are added to their day's row as a delta; updated or deleted sets
+trigger a recompute of just the affected (user, exercise, day) rows. To
+rebuild every row from ``training_exercises`` (e.g. after the table is first
+created, or after sets were deleted outside the API):
+
+    python -m app.rollups rebuild
+"""
+import asyncio
+import sys
+from datetime import date, datetime, timedelta, timezone
+from typing import Iterable, List, Sequence, Tuple
+
+from prisma import Prisma
+
+# Epley estimate over training_exercises aliased ``te``; a single is its own 1RM
+ESTIMATED_1RM_SQL = (
+    'CASE WHEN te."reps" = 1 THEN te."kgs" '
+    'ELSE te."kgs" * (1 + te."reps" / 30.0) END'
+)
+
+_INSERT_AGGREGATES = f"""
+    INSERT INTO "exercise_daily_rollups"
+        ("userId", "exerciseId", "day", "volume", "sets", "reps", "maxKgs",
+         "maxEstimated1RM")
+    SELECT
+        te."userId",
+        pe."exerciseId",
+        te."timestamp"::date,
+        SUM(te."kgs" * te."reps"),
+        COUNT(*),
+        SUM(te."reps"),
+        MAX(te."kgs"),
+        MAX({ESTIMATED_1RM_SQL})
+    FROM "training_exercises" AS te
+    JOIN "plan_exercises" AS pe ON pe."id" = te."planExerciseId"
+"""
+
+_GROUP_BY = """
+    WHERE {where}
+    GROUP BY te."userId", pe."exerciseId", te."timestamp"::date
+"""
+
+
+def _day(timestamp: datetime) -> date:
+    """Calendar day of a timestamp as stored by Prisma (UTC)."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.date()
+
+
+async def add_sets(db: Prisma, set_ids: Sequence[int]):
+    """Add newly inserted sets to their rollup rows, in one statement."""
+    if not set_ids:
+        return
+    placeholders = ", ".join(f"${i}" for i in range(1, len(set_ids) + 1))
+    where = f'te."id" IN ({placeholders}) AND te."userId" IS NOT NULL'
+    await db.execute_raw(
+        _INSERT_AGGREGATES
+        + _GROUP_BY.format(where=where)
+        + """
+        ON CONFLICT ("userId", "exerciseId", "day") DO UPDATE SET
+            "volume" = "exercise_daily_rollups"."volume" + EXCLUDED."volume",
+            "sets" = "exercise_daily_rollups"."sets" + EXCLUDED."sets",
+            "reps" = "exercise_daily_rollups"."reps" + EXCLUDED."reps",
+            "maxKgs" = GREATEST("exercise_daily_rollups"."maxKgs", EXCLUDED."maxKgs"),
+            "maxEstimated1RM" = GREATEST(
+                "exercise_daily_rollups"."maxEstimated1RM", EXCLUDED."maxEstimated1RM"
+            )
+        """,
+        *set_ids,
+    )
+
+
+async def refresh(db: Prisma, user_id: int, sets: Iterable[Tuple[int, datetime]]):
+    """Recompute the rollup rows touched by ``sets`` ((planExerciseId, timestamp)
+    pairs), e.g. after they were updated or deleted."""
+    keys = sorted(
+        {(plan_exercise_id, _day(timestamp)) for plan_exercise_id, timestamp in sets}
+    )
+    if not keys:
+        return
+
+    args = [user_id]
+    values = []
+    for plan_exercise_id, day in keys:
+        args.extend([plan_exercise_id, day.isoformat()])
+        values.append(f"(${len(args) - 1}::int, ${len(args)}::date)")
+    # (exerciseId, day) pairs to recompute
+    targets = f"""
+        SELECT DISTINCT pe."exerciseId", k."day"
+        FROM (VALUES {", ".join(values)}) AS k("planExerciseId", "day")
+        JOIN "plan_exercises" AS pe ON pe."id" = k."planExerciseId"
+    """
+    await _recompute(db, targets, args)
+
+
+async def exercise_days(
+    db: Prisma, user_id: int, where: str, *args
+) -> List[Tuple[int, date]]:
+    """(exerciseId, day) pairs of the user's sets matching ``where`` (over ``te``
+    and ``pe``, parameters from ``$2``).
+
+    ``refresh`` finds the exercise through the plan exercise, so when a cascade
+    delete removes plan exercises too, read these first and pass them to
+    ``refresh_days`` afterwards.
+    """
+    rows = await db.query_raw(
+        f"""
+        SELECT DISTINCT pe."exerciseId", te."timestamp"::date::text AS "day"
+        FROM "training_exercises" AS te
+        JOIN "plan_exercises" AS pe ON pe."id" = te."planExerciseId"
+        WHERE te."userId" = $1 AND {where}
+        """,
+        user_id,
+        *args,
+    )
+    return [(row["exerciseId"], date.fromisoformat(row["day"])) for row in rows]
+
+
+async def refresh_days(db: Prisma, user_id: int, days: Iterable[Tuple[int, date]]):
+    """Recompute the rollup rows for ``days`` ((exerciseId, day) pairs)."""
+    keys = sorted(set(days))
+    if not keys:
+        return
+
+    args = [user_id]
+    values = []
+    for exercise_id, day in keys:
+        args.extend([exercise_id, day.isoformat()])
+        values.append(f"(${len(args) - 1}::int, ${len(args)}::date)")
+    targets = f"""
+        SELECT k."exerciseId", k."day"
+        FROM (VALUES {", ".join(values)}) AS k("exerciseId", "day")
+    """
+    await _recompute(db, targets, args)
+
+
+async def _recompute(db: Prisma, targets: str, args: list):
+    """Replace the rows of user ``$1`` selected by ``targets`` (a query returning
+    ``exerciseId`` and ``day``) with fresh aggregates."""
+    async with db.tx() as tx:
+        await tx.execute_raw(
+            f"""
+            DELETE FROM "exercise_daily_rollups" AS r
+            USING ({targets}) AS t
+            WHERE r."userId" = $1
+                AND r."exerciseId" = t."exerciseId"
+                AND r."day" = t."day"
+            """,
+            *args,
+        )
+        await tx.execute_raw(
+            _INSERT_AGGREGATES
+            + f"""
+            JOIN ({targets}) AS t
+                ON t."exerciseId" = pe."exerciseId" AND t."day" = te."timestamp"::date
+            """
+            + _GROUP_BY.format(where='te."userId" = $1'),
+            *args,
+        )
+
+
+async def rebuild(db: Prisma):
+    """Recompute every rollup row from ``training_exercises``."""
+    # Scans the whole set table, so allow far more than the default 5s
+    async with db.tx(timeout=timedelta(minutes=30)) as tx:
+        await tx.execute_raw('DELETE FROM "exercise_daily_rollups"')
+        return await tx.execute_raw(
+            _INSERT_AGGREGATES + _GROUP_BY.format(where='te."userId" IS NOT NULL')
+        )
+
+
+async def main(argv):
+    if argv[1:] != ["rebuild"]:
+        print("usage: python -m app.rollups rebuild")
+        sys.exit(2)
+
+    db = Prisma()
+    await db.connect()
+    try:
+        count = await rebuild(db)
+    finally:
+        await db.disconnect()
+    print(f"Rebuilt {count} rollup rows")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv))
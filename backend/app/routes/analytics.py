@@ -0,0 +1,191 @@
+from datetime import datetime
+from typing import List, Literal, Optional
+
+from app.database import get_current_user, get_db
+from app.queries import placeholder
+from app.schemas import (
+    DropSetStatsResponse,
+    ExerciseProgressResponse,
+    PlanAdherenceResponse,
+)
+from fastapi import APIRouter, Depends, Query
+from prisma import Prisma
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+
+@router.get("/progress", response_model=List[ExerciseProgressResponse])
+async def get_progress(
+    period: Literal["day", "week"] = Query("week"),
+    exercise_id: Optional[int] = Query(None, description="Only this exercise"),
+    start_from: Optional[datetime] = Query(None),
+    start_to: Optional[datetime] = Query(None),
+    current_user=Depends(get_current_user),
+    db: Prisma = Depends(get_db),
+):
+    """Volume, top set, set count and estimated 1RM per exercise per day or week.
+
+    Read from the daily rollups (see app.rollups), so a chart touches one row
+    per exercise per training day instead of every logged set. Date filters
+    apply to whole days.
+    """
+    args = [period, current_user.id]
+    conditions = ['"userId" = $2']
+    for condition, value in (
+        ('"exerciseId" = {}', exercise_id),
+        ('"day" >= {}::date', start_from),
+        ('"day" < {}::date', start_to),
+    ):
+        if value is not None:
+            args.append(value)
+            conditions.append(condition.format(placeholder(len(args), value)))
+
+    rows = await db.query_raw(
+        f"""
+        SELECT
+            "exerciseId",
+            date_trunc($1, "day"::timestamp) AS "period",
+            SUM("volume") AS "volume",
+            MAX("maxKgs") AS "topSet",
+            SUM("sets")::int AS "sets",
+            SUM("reps")::int AS "reps",
+            MAX("maxEstimated1RM") AS "estimated1RM"
+        FROM "exercise_daily_rollups"
+        WHERE {" AND ".join(conditions)}
+        GROUP BY 1, 2
+        ORDER BY 1, 2
+        """,
+        *args,
+    )
+    return rows
+
+
+@router.get("/drop-sets", response_model=List[DropSetStatsResponse])
+async def get_drop_sets(
+    plan_exercise_id: Optional[int] = Query(None, description="Only this exercise"),
+    start_from: Optional[datetime] = Query(None),
+    start_to: Optional[datetime] = Query(None),
+    current_user=Depends(get_current_user),
+    db: Prisma = Depends(get_db),
+):
+    """Drop curve of each declining exercise, ordered by plan exercise and time.
+
+    All positions are read in one query; the step from each position to the
+    previous one is computed with window functions, then aggregated per drop
+    set, so no per-record includes are needed.
+    """
+    args = [current_user.id]
+    conditions = ['d."userId" = $1']
+    for condition, value in (
+        ('d."planExerciseId" = {}', plan_exercise_id),
+        ('d."timestamp" >= {}', start_from),
+        ('d."timestamp" < {}', start_to),
+    ):
+        if value is not None:
+            args.append(value)
+            conditions.append(condition.format(placeholder(len(args), value)))
+
+    rows = await db.query_raw(
+        f"""
+        WITH steps AS (
+            SELECT
+                d."id" AS "decliningExerciseId",
+                d."planExerciseId",
+                d."timestamp",
+                p."id",
+                p."kgs",
+                p."reps",
+                p."kgs" / NULLIF(LAG(p."kgs") OVER w, 0) AS "kgsRatio",
+                p."reps"::float / NULLIF(LAG(p."reps") OVER w, 0) AS "repsRatio"
+            FROM "declining_training_exercises" AS d
+            JOIN "declining_training_exercise_positions" AS p
+                ON p."decliningExerciseId" = d."id"
+            WHERE {" AND ".join(conditions)}
+            WINDOW w AS (PARTITION BY d."id" ORDER BY p."id")
+        )
+        SELECT
+            "decliningExerciseId",
+            "planExerciseId",
+            "timestamp",
+            COUNT(*)::int AS "positions",
+            SUM("kgs" * "reps") AS "volume",
+            (ARRAY_AGG("kgs" ORDER BY "id"))[1] AS "startKgs",
+            (ARRAY_AGG("kgs" ORDER BY "id" DESC))[1] AS "endKgs",
+            (ARRAY_AGG("reps" ORDER BY "id"))[1] AS "startReps",
+            (ARRAY_AGG("reps" ORDER BY "id" DESC))[1] AS "endReps",
+            AVG("kgsRatio") AS "avgKgsRatio",
+            AVG("repsRatio") AS "avgRepsRatio"
+        FROM steps
+        GROUP BY "decliningExerciseId", "planExerciseId", "timestamp"
+        ORDER BY "planExerciseId", "timestamp", "decliningExerciseId"
+        """,
+        *args,
+    )
+    return rows
+
+
+@router.get("/adherence", response_model=List[PlanAdherenceResponse])
+async def get_adherence(
+    plan_id: Optional[int] = Query(None, description="Only this plan"),
+    start_from: Optional[datetime] = Query(None),
+    start_to: Optional[datetime] = Query(None),
+    current_user=Depends(get_current_user),
+    db: Prisma = Depends(get_db),
+):
+    """Planned vs performed sets and reps per plan exercise, by plan week.
+
+    One aggregate query over the user's plan exercises and the sets logged
+    against them (optionally only sets within the date range). With a plan,
+    every plan exercise is listed, including ones never done; without one,
+    only plan exercises with sets in the range are.
+    """
+    args = [current_user.id]
+    conditions = ['pe."userId" = $1']
+    set_conditions = ['te."userId" = $1']
+    for target, condition, value in (
+        (conditions, 'pe."planId" = {}', plan_id),
+        (set_conditions, 'te."timestamp" >= {}', start_from),
+        (set_conditions, 'te."timestamp" < {}', start_to),
+    ):
+        if value is not None:
+            args.append(value)
+            target.append(condition.format(placeholder(len(args), value)))
+    having = "" if plan_id is not None else 'HAVING COUNT(te."id") > 0'
+
+    rows = await db.query_raw(
+        f"""
+        SELECT
+            pe."planId",
+            pt."planWeekId",
+            pw."startDate" AS "weekStartDate",
+            pe."planTrainingId",
+            pe."id" AS "planExerciseId",
+            pe."exerciseId",
+            pe."intensity",
+            pe."minSets",
+            pe."maxSets",
+            pe."minReps",
+            pe."maxReps",
+            COUNT(DISTINCT te."trainingId")::int AS "trainings",
+            COUNT(te."id")::int AS "performedSets",
+            COALESCE(SUM(te."reps"), 0)::int AS "performedReps",
+            COUNT(te."id")::float / NULLIF(COUNT(DISTINCT te."trainingId"), 0)
+                AS "avgSetsPerTraining",
+            AVG(te."reps")::float AS "avgReps",
+            COUNT(te."id") FILTER (
+                WHERE te."reps" BETWEEN pe."minReps" AND pe."maxReps"
+            )::int AS "setsInRepRange"
+        FROM "plan_exercises" AS pe
+        JOIN "plan_trainings" AS pt ON pt."id" = pe."planTrainingId"
+        JOIN "plan_weeks" AS pw ON pw."id" = pt."planWeekId"
+        LEFT JOIN "training_exercises" AS te
+            ON te."planExerciseId" = pe."id" AND {" AND ".join(set_conditions)}
+        WHERE {" AND ".join(conditions)}
+        GROUP BY pe."id", pt."planWeekId", pw."startDate"
+        {having}
+        ORDER BY
+            pe."planId", pw."startDate", pt."planWeekId", pe."planTrainingId", pe."id"
+        """,
+        *args,
+    )
+    return rows
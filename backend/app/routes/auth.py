@@ -1,8 +1,13 @@
 from datetime import timedelta
 
-from app.auth import create_access_token, get_password_hash, verify_password
+from app.auth import PasswordHasherBusy, create_access_token, password_hasher
 from app.config import settings
-from app.database import get_db
+from app.database import (
+    get_current_user,
+    get_db,
+    invalidate_cached_user,
+    revocation_list,
+)
 from app.schemas import Token, UserCreate, UserLogin, UserResponse
 from fastapi import APIRouter, Depends, HTTPException, status
 from prisma import Prisma
@@ -10,6 +15,14 @@ from prisma import Prisma
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
 
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many authentication requests, please retry",
+        headers={"Retry-After": "1"},
+    )
+
+
 @router.post(
     "/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED
 )
@@ -23,12 +36,16 @@ async def register(user: UserCreate, db: Prisma = Depends(get_db)):
         )
 
     # Hash the password
-    hashed_password = get_password_hash(user.password)
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise _hasher_busy()
 
     # Create new user
     new_user = await db.user.create(
         data={"username": user.username, "password": hashed_password}
     )
+    invalidate_cached_user(new_user.username)
 
     return new_user
 
@@ -38,7 +55,14 @@ async def login(user_data: UserLogin, db: Prisma = Depends(get_db)):
     # Find user
     user = await db.user.find_unique(where={"username": user_data.username})
 
-    if not user or not verify_password(user_data.password, user.password):
+    try:
+        password_ok = user is not None and await password_hasher.verify(
+            user_data.password, user.password
+        )
+    except PasswordHasherBusy:
+        raise _hasher_busy()
+
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -48,7 +72,21 @@ async def login(user_data: UserLogin, db: Prisma = Depends(get_db)):
     # Create access token
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id, "ver": user.tokenVersion},
+        expires_delta=access_token_expires,
     )
 
     return {"access_token": access_token, "token_type": "bearer"}
+
+
+@router.post("/revoke", status_code=status.HTTP_204_NO_CONTENT)
+async def revoke_tokens(
+    current_user=Depends(get_current_user), db: Prisma = Depends(get_db)
+):
+    # Invalidate every token issued so far for this user
+    user = await db.user.update(
+        where={"id": current_user.id}, data={"tokenVersion": {"increment": 1}}
+    )
+    revocation_list.revoke(user.id, user.tokenVersion)
+    invalidate_cached_user(user.username)
+    return None
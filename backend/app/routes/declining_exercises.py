@@ -1,7 +1,9 @@
 from datetime import datetime
-from typing import List
+from typing import List, Optional
 
 from app.database import get_current_user, get_db
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from app.queries import update_owned
 from app.schemas import (
     DecliningTrainingExerciseCreate,
     DecliningTrainingExercisePositionCreate,
@@ -10,8 +12,9 @@ from app.schemas import (
     DecliningTrainingExerciseResponse,
     DecliningTrainingExerciseUpdate,
 )
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from prisma import Prisma
+from prisma.models import DecliningTrainingExercise, DecliningTrainingExercisePosition
 
 router = APIRouter(prefix="/declining-exercises", tags=["Declining Training Exercises"])
 
@@ -27,16 +30,10 @@ async def create_declining_training_exercise(
     db: Prisma = Depends(get_db),
 ):
     # Verify plan exercise belongs to user
-    plan_exercise = await db.planexercise.find_unique(
-        where={"id": declining_exercise.planExerciseId},
-        include={
-            "planTraining": {"include": {"planWeek": {"include": {"plan": True}}}}
-        },
+    plan_exercise = await db.planexercise.find_first(
+        where={"id": declining_exercise.planExerciseId, "userId": current_user.id}
     )
-    if (
-        not plan_exercise
-        or plan_exercise.planTraining.planWeek.plan.userId != current_user.id
-    ):
+    if not plan_exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan exercise not found"
         )
@@ -49,6 +46,7 @@ async def create_declining_training_exercise(
         data={
             "timestamp": timestamp,
             "planExerciseId": declining_exercise.planExerciseId,
+            "userId": current_user.id,
         }
     )
     return new_declining_exercise
@@ -60,26 +58,28 @@ async def create_declining_training_exercise(
 )
 async def get_declining_exercises_by_plan_exercise(
     plan_exercise_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
     # Verify plan exercise belongs to user
-    plan_exercise = await db.planexercise.find_unique(
-        where={"id": plan_exercise_id},
-        include={
-            "planTraining": {"include": {"planWeek": {"include": {"plan": True}}}}
-        },
+    plan_exercise = await db.planexercise.find_first(
+        where={"id": plan_exercise_id, "userId": current_user.id}
     )
-    if (
-        not plan_exercise
-        or plan_exercise.planTraining.planWeek.plan.userId != current_user.id
-    ):
+    if not plan_exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan exercise not found"
         )
 
-    declining_exercises = await db.decliningtrainingexercise.find_many(
-        where={"planExerciseId": plan_exercise_id}
+    declining_exercises = await paginate(
+        db.decliningtrainingexercise,
+        response,
+        where={"planExerciseId": plan_exercise_id},
+        limit=limit,
+        cursor=cursor,
+        order_by=("timestamp", "id"),
     )
     return declining_exercises
 
@@ -92,23 +92,10 @@ async def get_declining_training_exercise(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    declining_exercise = await db.decliningtrainingexercise.find_unique(
-        where={"id": declining_exercise_id},
-        include={
-            "planExercise": {
-                "include": {
-                    "planTraining": {
-                        "include": {"planWeek": {"include": {"plan": True}}}
-                    }
-                }
-            }
-        },
+    declining_exercise = await db.decliningtrainingexercise.find_first(
+        where={"id": declining_exercise_id, "userId": current_user.id}
     )
-    if (
-        not declining_exercise
-        or declining_exercise.planExercise.planTraining.planWeek.plan.userId
-        != current_user.id
-    ):
+    if not declining_exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Declining training exercise not found",
@@ -125,32 +112,20 @@ async def update_declining_training_exercise(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    declining_exercise = await db.decliningtrainingexercise.find_unique(
-        where={"id": declining_exercise_id},
-        include={
-            "planExercise": {
-                "include": {
-                    "planTraining": {
-                        "include": {"planWeek": {"include": {"plan": True}}}
-                    }
-                }
-            }
-        },
-    )
-    if (
-        not declining_exercise
-        or declining_exercise.planExercise.planTraining.planWeek.plan.userId
-        != current_user.id
-    ):
+    update_data = declining_exercise_data.model_dump(exclude_unset=True)
+    updated_declining_exercise = await update_owned(
+        db,
+        DecliningTrainingExercise,
+        "declining_training_exercises",
+        declining_exercise_id,
+        current_user.id,
+        update_data,
+    )
+    if not updated_declining_exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Declining training exercise not found",
         )
-
-    update_data = declining_exercise_data.model_dump(exclude_unset=True)
-    updated_declining_exercise = await db.decliningtrainingexercise.update(
-        where={"id": declining_exercise_id}, data=update_data
-    )
     return updated_declining_exercise
 
 
@@ -160,29 +135,14 @@ async def delete_declining_training_exercise(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    declining_exercise = await db.decliningtrainingexercise.find_unique(
-        where={"id": declining_exercise_id},
-        include={
-            "planExercise": {
-                "include": {
-                    "planTraining": {
-                        "include": {"planWeek": {"include": {"plan": True}}}
-                    }
-                }
-            }
-        },
+    deleted = await db.decliningtrainingexercise.delete_many(
+        where={"id": declining_exercise_id, "userId": current_user.id}
     )
-    if (
-        not declining_exercise
-        or declining_exercise.planExercise.planTraining.planWeek.plan.userId
-        != current_user.id
-    ):
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Declining training exercise not found",
         )
-
-    await db.decliningtrainingexercise.delete(where={"id": declining_exercise_id})
     return None
 
 
@@ -199,23 +159,10 @@ async def create_declining_exercise_position(
     db: Prisma = Depends(get_db),
 ):
     # Verify declining exercise belongs to user
-    declining_exercise = await db.decliningtrainingexercise.find_unique(
-        where={"id": declining_exercise_id},
-        include={
-            "planExercise": {
-                "include": {
-                    "planTraining": {
-                        "include": {"planWeek": {"include": {"plan": True}}}
-                    }
-                }
-            }
-        },
+    declining_exercise = await db.decliningtrainingexercise.find_first(
+        where={"id": declining_exercise_id, "userId": current_user.id}
     )
-    if (
-        not declining_exercise
-        or declining_exercise.planExercise.planTraining.planWeek.plan.userId
-        != current_user.id
-    ):
+    if not declining_exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Declining training exercise not found",
@@ -226,6 +173,7 @@ async def create_declining_exercise_position(
             "kgs": position.kgs,
             "reps": position.reps,
             "decliningExerciseId": declining_exercise_id,
+            "userId": current_user.id,
         }
     )
     return new_position
@@ -237,34 +185,28 @@ async def create_declining_exercise_position(
 )
 async def get_declining_exercise_positions(
     declining_exercise_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
     # Verify declining exercise belongs to user
-    declining_exercise = await db.decliningtrainingexercise.find_unique(
-        where={"id": declining_exercise_id},
-        include={
-            "planExercise": {
-                "include": {
-                    "planTraining": {
-                        "include": {"planWeek": {"include": {"plan": True}}}
-                    }
-                }
-            }
-        },
+    declining_exercise = await db.decliningtrainingexercise.find_first(
+        where={"id": declining_exercise_id, "userId": current_user.id}
     )
-    if (
-        not declining_exercise
-        or declining_exercise.planExercise.planTraining.planWeek.plan.userId
-        != current_user.id
-    ):
+    if not declining_exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Declining training exercise not found",
         )
 
-    positions = await db.decliningtrainingexerciseposition.find_many(
-        where={"decliningExerciseId": declining_exercise_id}
+    positions = await paginate(
+        db.decliningtrainingexerciseposition,
+        response,
+        where={"decliningExerciseId": declining_exercise_id},
+        limit=limit,
+        cursor=cursor,
     )
     return positions
 
@@ -278,35 +220,19 @@ async def update_declining_exercise_position(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    position = await db.decliningtrainingexerciseposition.find_unique(
-        where={"id": position_id},
-        include={
-            "decliningExercise": {
-                "include": {
-                    "planExercise": {
-                        "include": {
-                            "planTraining": {
-                                "include": {"planWeek": {"include": {"plan": True}}}
-                            }
-                        }
-                    }
-                }
-            }
-        },
-    )
-    if (
-        not position
-        or position.decliningExercise.planExercise.planTraining.planWeek.plan.userId
-        != current_user.id
-    ):
+    update_data = position_data.model_dump(exclude_unset=True)
+    updated_position = await update_owned(
+        db,
+        DecliningTrainingExercisePosition,
+        "declining_training_exercise_positions",
+        position_id,
+        current_user.id,
+        update_data,
+    )
+    if not updated_position:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Position not found"
         )
-
-    update_data = position_data.model_dump(exclude_unset=True)
-    updated_position = await db.decliningtrainingexerciseposition.update(
-        where={"id": position_id}, data=update_data
-    )
     return updated_position
 
 
@@ -316,30 +242,11 @@ async def delete_declining_exercise_position(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    position = await db.decliningtrainingexerciseposition.find_unique(
-        where={"id": position_id},
-        include={
-            "decliningExercise": {
-                "include": {
-                    "planExercise": {
-                        "include": {
-                            "planTraining": {
-                                "include": {"planWeek": {"include": {"plan": True}}}
-                            }
-                        }
-                    }
-                }
-            }
-        },
+    deleted = await db.decliningtrainingexerciseposition.delete_many(
+        where={"id": position_id, "userId": current_user.id}
     )
-    if (
-        not position
-        or position.decliningExercise.planExercise.planTraining.planWeek.plan.userId
-        != current_user.id
-    ):
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Position not found"
         )
-
-    await db.decliningtrainingexerciseposition.delete(where={"id": position_id})
     return None
@@ -1,9 +1,18 @@
 from typing import List, Optional
 
 from app.database import get_current_user, get_db
-from app.schemas import ExerciseCreate, ExerciseResponse, ExerciseUpdate
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from app.fields import parse_fields, select_model
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from app.queries import update_owned
+from app.schemas import (
+    ExerciseCreate,
+    ExerciseFields,
+    ExerciseResponse,
+    ExerciseUpdate,
+)
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from prisma import Prisma
+from prisma.models import Exercise
 
 router = APIRouter(prefix="/exercises", tags=["Exercises"])
 
@@ -27,10 +36,16 @@ async def create_exercise(
     return new_exercise
 
 
-@router.get("/", response_model=List[ExerciseResponse])
+@router.get(
+    "/", response_model=List[ExerciseFields], response_model_exclude_unset=True
+)
 async def get_exercises(
+    response: Response,
     search: Optional[str] = Query(None, description="Search exercises by name or description"),
     filter_type: Optional[str] = Query(None, description="Filter by 'my' or 'public'"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name"),
     current_user=Depends(get_current_user), 
     db: Prisma = Depends(get_db)
 ):
@@ -43,19 +58,38 @@ async def get_exercises(
     elif filter_type == "public":
         where_conditions = {"public": True}
     
-    # Apply search filter
+    # Apply search filter in the database (ILIKE, backed by trigram indexes)
     if search:
-        search_lower = search.lower()
-        exercises = await db.exercise.find_many(where=where_conditions)
-        # Filter in Python since Prisma doesn't support case-insensitive contains in all DBs
-        exercises = [
-            ex for ex in exercises 
-            if search_lower in ex.name.lower() or 
-            (ex.description and search_lower in ex.description.lower())
-        ]
+        where_conditions = {
+            "AND": [
+                where_conditions,
+                {
+                    "OR": [
+                        {"name": {"contains": search, "mode": "insensitive"}},
+                        {"description": {"contains": search, "mode": "insensitive"}},
+                    ]
+                },
+            ]
+        }
+        order_by = ("name", "id")
     else:
-        exercises = await db.exercise.find_many(where=where_conditions)
-    
+        order_by = ("id",)
+
+    # Only fetch the requested columns (plus the pagination keys)
+    delegate = db.exercise
+    selected = parse_fields(fields, ExerciseFields, always=order_by)
+    if selected is not None:
+        partial, _ = select_model(Exercise, selected)
+        delegate = partial.prisma(db)
+
+    exercises = await paginate(
+        delegate,
+        response,
+        where=where_conditions,
+        limit=limit,
+        cursor=cursor,
+        order_by=order_by,
+    )
     return exercises
 
 
@@ -82,20 +116,15 @@ async def update_exercise(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    # Check if exercise exists and belongs to user
-    exercise = await db.exercise.find_first(
-        where={"id": exercise_id, "userId": current_user.id}
+    # Update exercise only if it belongs to user
+    update_data = exercise_data.model_dump(exclude_unset=True)
+    updated_exercise = await update_owned(
+        db, Exercise, "exercises", exercise_id, current_user.id, update_data
     )
-    if not exercise:
+    if not updated_exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Exercise not found"
         )
-
-    # Update exercise
-    update_data = exercise_data.model_dump(exclude_unset=True)
-    updated_exercise = await db.exercise.update(
-        where={"id": exercise_id}, data=update_data
-    )
     return updated_exercise
 
 
@@ -105,14 +134,12 @@ async def delete_exercise(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    # Check if exercise exists and belongs to user
-    exercise = await db.exercise.find_first(
+    # Delete exercise only if it belongs to user
+    deleted = await db.exercise.delete_many(
         where={"id": exercise_id, "userId": current_user.id}
     )
-    if not exercise:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Exercise not found"
         )
-
-    await db.exercise.delete(where={"id": exercise_id})
     return None
@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+from typing import AsyncIterator, List, Literal
+
+from app.config import settings
+from app.database import get_current_user, get_db
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from prisma import Prisma
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+# Every exported record has these keys; unused ones are empty/null
+COLUMNS = [
+    "type",
+    "id",
+    "trainingId",
+    "startTime",
+    "endTime",
+    "timestamp",
+    "planExerciseId",
+    "exerciseId",
+    "exerciseName",
+    "decliningExerciseId",
+    "kgs",
+    "reps",
+]
+
+TRAININGS_SQL = """
+    SELECT
+        'training' AS "type", t."id", t."id" AS "trainingId", t."startTime",
+        t."endTime"
+    FROM "trainings" AS t
+    WHERE t."userId" = $1 AND t."id" > $2
+    ORDER BY t."id"
+    LIMIT $3
+"""
+
+# Keyset on (timestamp, id) so each chunk is a range scan of (userId, timestamp)
+SETS_SQL = """
+    SELECT
+        'set' AS "type", te."id", te."trainingId", te."timestamp", te."planExerciseId",
+        pe."exerciseId", e."name" AS "exerciseName", te."kgs", te."reps"
+    FROM "training_exercises" AS te
+    JOIN "plan_exercises" AS pe ON pe."id" = te."planExerciseId"
+    JOIN "exercises" AS e ON e."id" = pe."exerciseId"
+    WHERE te."userId" = $1
+        AND te."timestamp" >= $2::timestamp
+        AND (te."timestamp", te."id") > ($2::timestamp, $3)
+    ORDER BY te."timestamp", te."id"
+    LIMIT $4
+"""
+
+POSITIONS_SQL = """
+    SELECT
+        'position' AS "type", p."id", d."timestamp", d."planExerciseId",
+        pe."exerciseId", e."name" AS "exerciseName", p."decliningExerciseId",
+        p."kgs", p."reps"
+    FROM "declining_training_exercise_positions" AS p
+    JOIN "declining_training_exercises" AS d ON d."id" = p."decliningExerciseId"
+    JOIN "plan_exercises" AS pe ON pe."id" = d."planExerciseId"
+    JOIN "exercises" AS e ON e."id" = pe."exerciseId"
+    WHERE p."userId" = $1 AND p."id" > $2
+    ORDER BY p."id"
+    LIMIT $3
+"""
+
+
+async def _records(
+    db: Prisma, user_id: int, chunk_size: int
+) -> AsyncIterator[List[dict]]:
+    """The user's trainings, then sets, then drop set positions, one chunk at a
+    time, so memory use does not depend on the size of the history."""
+    last_id = 0
+    while True:
+        rows = await db.query_raw(TRAININGS_SQL, user_id, last_id, chunk_size)
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            break
+        last_id = rows[-1]["id"]
+
+    last_timestamp, last_id = "-infinity", 0
+    while True:
+        rows = await db.query_raw(
+            SETS_SQL, user_id, last_timestamp, last_id, chunk_size
+        )
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            break
+        last_timestamp, last_id = rows[-1]["timestamp"], rows[-1]["id"]
+
+    last_id = 0
+    while True:
+        rows = await db.query_raw(POSITIONS_SQL, user_id, last_id, chunk_size)
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            break
+        last_id = rows[-1]["id"]
+
+
+async def _csv(chunks: AsyncIterator[List[dict]]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS)
+    writer.writeheader()
+    async for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Only the header is left when there was nothing to export
+    if buffer.getvalue():
+        yield buffer.getvalue()
+
+
+async def _ndjson(chunks: AsyncIterator[List[dict]]) -> AsyncIterator[str]:
+    async for rows in chunks:
+        yield "".join(
+            json.dumps({column: row.get(column) for column in COLUMNS}) + "\n"
+            for row in rows
+        )
+
+
+@router.get("/")
+async def export_history(
+    export_format: Literal["csv", "ndjson"] = Query("ndjson", alias="format"),
+    current_user=Depends(get_current_user),
+    db: Prisma = Depends(get_db),
+):
+    """Stream the user's whole training history: trainings, sets and drop set
+    positions, with exercise names."""
+    chunks = _records(db, current_user.id, settings.EXPORT_CHUNK_SIZE)
+    if export_format == "csv":
+        body, media_type = _csv(chunks), "text/csv"
+    else:
+        body, media_type = _ndjson(chunks), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="training-history.{export_format}"'
+            )
+        },
+    )
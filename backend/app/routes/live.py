@@ -0,0 +1,230 @@
+import json
+import logging
+import time
+from datetime import datetime
+
+from app.auth import decode_access_token
+from app.database import authenticate_token, get_db, revocation_list
+from app.schemas import (
+    DecliningTrainingExerciseCreate,
+    DecliningTrainingExercisePositionCreate,
+    DecliningTrainingExercisePositionResponse,
+    DecliningTrainingExerciseResponse,
+    TrainingExerciseBatchItem,
+    TrainingExerciseResponse,
+    TrainingResponse,
+)
+from app.write_behind import create_set
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from prisma import Prisma
+from prisma.errors import PrismaError
+from pydantic import ValidationError
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/trainings", tags=["Live Training"])
+
+
+class LiveSession:
+    """Ownership context of one live-workout connection.
+
+    Everything a message needs to be authorized (the user, the training and
+    its plan exercises, the declining exercises seen so far) is loaded once
+    when the socket opens, so logging a set is a single insert.
+    """
+
+    def __init__(
+        self, db: Prisma, user, token_payload: dict, training, plan_exercise_ids
+    ):
+        self.db = db
+        self.user = user
+        self.token_expires_at = token_payload.get("exp")
+        self.token_version = token_payload.get("ver", 0)
+        self.training = training
+        self.plan_exercise_ids = plan_exercise_ids
+        self.declining_ids = set()
+
+    async def token_valid(self) -> bool:
+        """Whether the token the socket was opened with is still accepted; the
+        connection can outlive its expiry or a revocation."""
+        if self.token_expires_at is not None and time.time() >= self.token_expires_at:
+            return False
+        await revocation_list.refresh_if_stale(self.db)
+        return not revocation_list.is_revoked(self.user.id, self.token_version)
+
+    def _check_plan_exercise(self, plan_exercise_id: int):
+        if plan_exercise_id not in self.plan_exercise_ids:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Plan exercise does not belong to this training's plan",
+            )
+
+    async def log_set(self, payload: dict) -> dict:
+        item = TrainingExerciseBatchItem.model_validate(payload)
+        self._check_plan_exercise(item.planExerciseId)
+        data = {
+            "reps": item.reps,
+            "kgs": item.kgs,
+            "timestamp": item.timestamp,
+            "trainingId": self.training.id,
+            "planExerciseId": item.planExerciseId,
+            "userId": self.user.id,
+        }
+        row = await create_set(self.db, data)
+        return TrainingExerciseResponse.model_validate(row).model_dump(mode="json")
+
+    async def start_declining(self, payload: dict) -> dict:
+        item = DecliningTrainingExerciseCreate.model_validate(payload)
+        self._check_plan_exercise(item.planExerciseId)
+        row = await self.db.decliningtrainingexercise.create(
+            data={
+                "timestamp": item.timestamp if item.timestamp else datetime.now(),
+                "planExerciseId": item.planExerciseId,
+                "userId": self.user.id,
+            }
+        )
+        self.declining_ids.add(row.id)
+        return DecliningTrainingExerciseResponse.model_validate(row).model_dump(
+            mode="json"
+        )
+
+    async def log_position(self, payload: dict) -> dict:
+        item = DecliningTrainingExercisePositionCreate.model_validate(payload)
+        if item.decliningExerciseId not in self.declining_ids:
+            # Started before this connection; checked once, then remembered
+            declining_exercise = await self.db.decliningtrainingexercise.find_first(
+                where={"id": item.decliningExerciseId, "userId": self.user.id}
+            )
+            if not declining_exercise:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Declining training exercise not found",
+                )
+            self.declining_ids.add(declining_exercise.id)
+
+        row = await self.db.decliningtrainingexerciseposition.create(
+            data={
+                "kgs": item.kgs,
+                "reps": item.reps,
+                "decliningExerciseId": item.decliningExerciseId,
+                "userId": self.user.id,
+            }
+        )
+        return DecliningTrainingExercisePositionResponse.model_validate(row).model_dump(
+            mode="json"
+        )
+
+    async def end(self, payload: dict) -> dict:
+        self.training = await self.db.training.update(
+            where={"id": self.training.id}, data={"endTime": datetime.now()}
+        )
+        return TrainingResponse.model_validate(self.training).model_dump(mode="json")
+
+
+HANDLERS = {
+    "set": LiveSession.log_set,
+    "declining": LiveSession.start_declining,
+    "position": LiveSession.log_position,
+    "end": LiveSession.end,
+}
+
+
+@router.websocket("/{training_id}/live")
+async def live_training(
+    websocket: WebSocket, training_id: int, token: str, db: Prisma = Depends(get_db)
+):
+    """Live-workout channel for one training.
+
+    Authenticated with ``?token=<access token>``; the socket is closed (1008)
+    once the token expires or is revoked. Each message is a JSON
+    object with a ``type`` (``set``, ``declining``, ``position`` or ``end``),
+    the fields of the matching REST request body and an optional ``ref``. Every
+    message is answered with ``{"type": "ack", "ref", "data"}`` or
+    ``{"type": "error", "ref", "detail"}``, including when the write fails in
+    the database.
+    """
+    try:
+        user = await authenticate_token(token, db)
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    training = await db.training.find_first(
+        where={"id": training_id, "userId": user.id}
+    )
+    if not training:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    plan_exercises = await db.planexercise.find_many(
+        where={"planTrainingId": training.planTrainingId}
+    )
+    session = LiveSession(
+        db,
+        user,
+        decode_access_token(token),
+        training,
+        {pe.id for pe in plan_exercises},
+    )
+
+    await websocket.accept()
+    try:
+        while True:
+            text = await websocket.receive_text()
+            if not await session.token_valid():
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+                return
+
+            try:
+                message = json.loads(text)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                await websocket.send_json(
+                    {"type": "error", "ref": None, "detail": "Expected a JSON object"}
+                )
+                continue
+
+            ref = message.get("ref")
+            handler = HANDLERS.get(message.get("type"))
+            if handler is None:
+                await websocket.send_json(
+                    {"type": "error", "ref": ref, "detail": "Unknown message type"}
+                )
+                continue
+
+            try:
+                data = await handler(session, message)
+            except ValidationError as exc:
+                await websocket.send_json(
+                    {
+                        "type": "error",
+                        "ref": ref,
+                        "detail": exc.errors(include_url=False, include_context=False),
+                    }
+                )
+                continue
+            except HTTPException as exc:
+                await websocket.send_json(
+                    {"type": "error", "ref": ref, "detail": exc.detail}
+                )
+                continue
+            except PrismaError:
+                # E.g. the training or plan exercise was deleted mid-session;
+                # only this message fails, the session stays open
+                logger.exception("Live %s message failed", message.get("type"))
+                await websocket.send_json(
+                    {"type": "error", "ref": ref, "detail": "Could not store the message"}
+                )
+                continue
+
+            await websocket.send_json({"type": "ack", "ref": ref, "data": data})
+    except WebSocketDisconnect:
+        pass
@@ -1,9 +1,17 @@
-from typing import List
+from typing import List, Optional
 
+from app import records, rollups
 from app.database import get_current_user, get_db
-from app.schemas import PlanExerciseCreate, PlanExerciseResponse, PlanExerciseUpdate
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.fields import parse_fields, select_model
+from app.schemas import (
+    PlanExerciseCreate,
+    PlanExerciseFields,
+    PlanExerciseResponse,
+    PlanExerciseUpdate,
+)
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from prisma import Prisma
+from prisma.models import PlanExercise
 
 router = APIRouter(prefix="/plan-exercises", tags=["Plan Exercises"])
 
@@ -17,11 +25,10 @@ async def create_plan_exercise(
     db: Prisma = Depends(get_db),
 ):
     # Verify plan training belongs to user
-    plan_training = await db.plantraining.find_unique(
-        where={"id": plan_exercise.planTrainingId},
-        include={"planWeek": {"include": {"plan": True}}},
+    plan_training = await db.plantraining.find_first(
+        where={"id": plan_exercise.planTrainingId, "userId": current_user.id}
     )
-    if not plan_training or plan_training.planWeek.plan.userId != current_user.id:
+    if not plan_training:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan training not found"
         )
@@ -46,6 +53,8 @@ async def create_plan_exercise(
     data = {
         "planTrainingId": plan_exercise.planTrainingId,
         "exerciseId": plan_exercise.exerciseId,
+        "planId": plan_training.planId,
+        "userId": current_user.id,
     }
 
     # copy allowed optional fields if present in the request
@@ -60,25 +69,42 @@ async def create_plan_exercise(
     return new_plan_exercise
 
 
-@router.get("/training/{plan_training_id}", response_model=List[PlanExerciseResponse])
+@router.get(
+    "/training/{plan_training_id}",
+    response_model=List[PlanExerciseFields],
+    response_model_exclude_unset=True,
+)
 async def get_plan_exercises_by_training(
     plan_training_id: int,
+    fields: Optional[str] = Query(
+        None, description="Comma-separated fields to return, e.g. id,exercise.name"
+    ),
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
     # Verify plan training belongs to user or is public
-    plan_training = await db.plantraining.find_unique(
-        where={"id": plan_training_id},
-        include={"planWeek": {"include": {"plan": True}}},
+    plan_training = await db.plantraining.find_first(
+        where={
+            "id": plan_training_id,
+            "OR": [{"userId": current_user.id}, {"plan": {"is": {"public": True}}}],
+        }
     )
-    if not plan_training or (plan_training.planWeek.plan.userId != current_user.id and not plan_training.planWeek.plan.public):
+    if not plan_training:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan training not found"
         )
 
-    plan_exercises = await db.planexercise.find_many(
-        where={"planTrainingId": plan_training_id}, include={"exercise": True}
-    )
+    selected = parse_fields(fields, PlanExerciseFields)
+    if selected is None:
+        plan_exercises = await db.planexercise.find_many(
+            where={"planTrainingId": plan_training_id}, include={"exercise": True}
+        )
+    else:
+        # Only fetch the requested columns; the exercise join only if asked for
+        partial, include = select_model(PlanExercise, selected)
+        plan_exercises = await partial.prisma(db).find_many(
+            where={"planTrainingId": plan_training_id}, include=include
+        )
     return plan_exercises
 
 
@@ -88,19 +114,15 @@ async def get_plan_exercise(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    plan_exercise = await db.planexercise.find_unique(
-        where={"id": plan_exercise_id},
-        include={
-            "planTraining": {"include": {"planWeek": {"include": {"plan": True}}}},
-            "exercise": True
+    # Allow access if plan belongs to user or is public
+    plan_exercise = await db.planexercise.find_first(
+        where={
+            "id": plan_exercise_id,
+            "OR": [{"userId": current_user.id}, {"plan": {"is": {"public": True}}}],
         },
+        include={"exercise": True},
     )
-    # Allow access if plan belongs to user or is public
-    if (
-        not plan_exercise
-        or (plan_exercise.planTraining.planWeek.plan.userId != current_user.id 
-            and not plan_exercise.planTraining.planWeek.plan.public)
-    ):
+    if not plan_exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan exercise not found"
         )
@@ -114,25 +136,19 @@ async def update_plan_exercise(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    plan_exercise = await db.planexercise.find_unique(
-        where={"id": plan_exercise_id},
-        include={
-            "planTraining": {"include": {"planWeek": {"include": {"plan": True}}}}
-        },
+    # The ownership predicate is part of the UPDATE itself; the response still
+    # needs the related exercise, which is read back afterwards
+    update_data = plan_exercise_data.model_dump(exclude_unset=True)
+    updated = await db.planexercise.update_many(
+        where={"id": plan_exercise_id, "userId": current_user.id}, data=update_data
     )
-    if (
-        not plan_exercise
-        or plan_exercise.planTraining.planWeek.plan.userId != current_user.id
-    ):
+    if not updated:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan exercise not found"
         )
 
-    update_data = plan_exercise_data.model_dump(exclude_unset=True)
-    updated_plan_exercise = await db.planexercise.update(
-        where={"id": plan_exercise_id}, 
-        data=update_data,
-        include={"exercise": True}
+    updated_plan_exercise = await db.planexercise.find_unique(
+        where={"id": plan_exercise_id}, include={"exercise": True}
     )
     return updated_plan_exercise
 
@@ -143,19 +159,19 @@ async def delete_plan_exercise(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    plan_exercise = await db.planexercise.find_unique(
-        where={"id": plan_exercise_id},
-        include={
-            "planTraining": {"include": {"planWeek": {"include": {"plan": True}}}}
-        },
+    # Sets go with the plan exercise by cascade; remember their exercises and days first
+    days = await rollups.exercise_days(
+        db, current_user.id, 'pe."id" = $2', plan_exercise_id
+    )
+    deleted = await db.planexercise.delete_many(
+        where={"id": plan_exercise_id, "userId": current_user.id}
     )
-    if (
-        not plan_exercise
-        or plan_exercise.planTraining.planWeek.plan.userId != current_user.id
-    ):
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan exercise not found"
         )
-
-    await db.planexercise.delete(where={"id": plan_exercise_id})
+    await rollups.refresh_days(db, current_user.id, days)
+    await records.refresh_exercises(
+        db, current_user.id, [exercise_id for exercise_id, _ in days]
+    )
     return None
@@ -1,9 +1,12 @@
 from typing import List
 
+from app import records, rollups
 from app.database import get_current_user, get_db
+from app.queries import update_owned
 from app.schemas import PlanTrainingCreate, PlanTrainingResponse, PlanTrainingUpdate
 from fastapi import APIRouter, Depends, HTTPException, status
 from prisma import Prisma
+from prisma.models import PlanTraining
 
 router = APIRouter(prefix="/plan-trainings", tags=["Plan Trainings"])
 
@@ -36,6 +39,8 @@ async def create_plan_training(
             "endTime": plan_training.endTime if plan_training.endTime else default_time,
             "intensity": plan_training.intensity,
             "planWeekId": plan_training.planWeekId,
+            "planId": plan_week.planId,
+            "userId": current_user.id,
         }
     )
     return new_plan_training
@@ -66,12 +71,14 @@ async def get_plan_training(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    plan_training = await db.plantraining.find_unique(
-        where={"id": plan_training_id},
-        include={"planWeek": {"include": {"plan": True}}},
-    )
     # Allow access if plan belongs to user or is public
-    if not plan_training or (plan_training.planWeek.plan.userId != current_user.id and not plan_training.planWeek.plan.public):
+    plan_training = await db.plantraining.find_first(
+        where={
+            "id": plan_training_id,
+            "OR": [{"userId": current_user.id}, {"plan": {"is": {"public": True}}}],
+        }
+    )
+    if not plan_training:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan training not found"
         )
@@ -85,19 +92,19 @@ async def update_plan_training(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    plan_training = await db.plantraining.find_unique(
-        where={"id": plan_training_id},
-        include={"planWeek": {"include": {"plan": True}}},
+    update_data = plan_training_data.model_dump(exclude_unset=True)
+    updated_plan_training = await update_owned(
+        db,
+        PlanTraining,
+        "plan_trainings",
+        plan_training_id,
+        current_user.id,
+        update_data,
     )
-    if not plan_training or plan_training.planWeek.plan.userId != current_user.id:
+    if not updated_plan_training:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan training not found"
         )
-
-    update_data = plan_training_data.model_dump(exclude_unset=True)
-    updated_plan_training = await db.plantraining.update(
-        where={"id": plan_training_id}, data=update_data
-    )
     return updated_plan_training
 
 
@@ -107,14 +114,19 @@ async def delete_plan_training(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    plan_training = await db.plantraining.find_unique(
-        where={"id": plan_training_id},
-        include={"planWeek": {"include": {"plan": True}}},
+    # Sets go with the plan training by cascade; remember their exercises and days first
+    days = await rollups.exercise_days(
+        db, current_user.id, 'pe."planTrainingId" = $2', plan_training_id
+    )
+    deleted = await db.plantraining.delete_many(
+        where={"id": plan_training_id, "userId": current_user.id}
     )
-    if not plan_training or plan_training.planWeek.plan.userId != current_user.id:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan training not found"
         )
-
-    await db.plantraining.delete(where={"id": plan_training_id})
+    await rollups.refresh_days(db, current_user.id, days)
+    await records.refresh_exercises(
+        db, current_user.id, [exercise_id for exercise_id, _ in days]
+    )
     return None
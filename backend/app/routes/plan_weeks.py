@@ -1,9 +1,12 @@
 from typing import List
 
+from app import records, rollups
 from app.database import get_current_user, get_db
+from app.queries import update_owned
 from app.schemas import PlanWeekCreate, PlanWeekResponse, PlanWeekUpdate
 from fastapi import APIRouter, Depends, HTTPException, status
 from prisma import Prisma
+from prisma.models import PlanWeek
 
 router = APIRouter(prefix="/plan-weeks", tags=["Plan Weeks"])
 
@@ -74,18 +77,20 @@ async def update_plan_week(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    plan_week = await db.planweek.find_unique(
-        where={"id": plan_week_id}, include={"plan": True}
+    update_data = plan_week_data.model_dump(exclude_unset=True)
+    updated_plan_week = await update_owned(
+        db,
+        PlanWeek,
+        "plan_weeks",
+        plan_week_id,
+        current_user.id,
+        update_data,
+        owner='(SELECT "userId" FROM "plans" WHERE "plans"."id" = "plan_weeks"."planId")',
     )
-    if not plan_week or plan_week.plan.userId != current_user.id:
+    if not updated_plan_week:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan week not found"
         )
-
-    update_data = plan_week_data.model_dump(exclude_unset=True)
-    updated_plan_week = await db.planweek.update(
-        where={"id": plan_week_id}, data=update_data
-    )
     return updated_plan_week
 
 
@@ -95,13 +100,23 @@ async def delete_plan_week(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    plan_week = await db.planweek.find_unique(
-        where={"id": plan_week_id}, include={"plan": True}
+    # Sets go with the week by cascade; remember their exercises and days first
+    days = await rollups.exercise_days(
+        db,
+        current_user.id,
+        'pe."planTrainingId" IN '
+        '(SELECT "id" FROM "plan_trainings" WHERE "planWeekId" = $2)',
+        plan_week_id,
+    )
+    deleted = await db.planweek.delete_many(
+        where={"id": plan_week_id, "plan": {"is": {"userId": current_user.id}}}
     )
-    if not plan_week or plan_week.plan.userId != current_user.id:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan week not found"
         )
-
-    await db.planweek.delete(where={"id": plan_week_id})
+    await rollups.refresh_days(db, current_user.id, days)
+    await records.refresh_exercises(
+        db, current_user.id, [exercise_id for exercise_id, _ in days]
+    )
     return None
@@ -1,12 +1,110 @@
-from typing import List
+from datetime import datetime, time
+from typing import List, Optional
 
+from app import records, rollups
 from app.database import get_current_user, get_db
-from app.schemas import PlanCreate, PlanResponse, PlanUpdate
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from app.queries import reserve_ids, update_owned
+from app.schemas import (
+    PlanCreate,
+    PlanFullCreate,
+    PlanResponse,
+    PlanTreeResponse,
+    PlanUpdate,
+)
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from prisma import Prisma
+from prisma.models import Plan
 
 router = APIRouter(prefix="/plans", tags=["Plans"])
 
+# Whole plan (weeks -> trainings -> exercises) in display order
+TREE_INCLUDE = {
+    "weeks": {
+        "order_by": [{"startDate": "asc"}, {"id": "asc"}],
+        "include": {
+            "trainings": {
+                "order_by": [{"startTime": "asc"}, {"id": "asc"}],
+                "include": {
+                    "exercises": {
+                        "order_by": {"id": "asc"},
+                        "include": {"exercise": True},
+                    }
+                },
+            }
+        },
+    }
+}
+
+
+async def _create_plan_tree(tx: Prisma, user_id: int, plan_data: dict, weeks: list):
+    """Insert a plan with all its weeks, trainings and plan exercises.
+
+    ``weeks`` is a list of week column dicts, each with a ``trainings`` list of
+    training column dicts, each with an ``exercises`` list. Ids for weeks and
+    trainings are reserved up front so every level is a single ``create_many``,
+    no matter how large the plan is.
+    """
+    new_plan = await tx.plan.create(data={**plan_data, "userId": user_id})
+
+    week_ids = await reserve_ids(tx, "plan_weeks", len(weeks))
+    trainings = [
+        (week_id, training)
+        for week_id, week in zip(week_ids, weeks)
+        for training in week["trainings"]
+    ]
+    training_ids = await reserve_ids(tx, "plan_trainings", len(trainings))
+
+    # Same defaults as POST /plan-weeks/ and POST /plan-trainings/
+    now = datetime.now()
+    default_time = datetime.combine(now.date(), time(12, 0))
+
+    week_rows = [
+        {
+            "id": week_id,
+            "planId": new_plan.id,
+            "startDate": week.get("startDate") or now,
+        }
+        for week_id, week in zip(week_ids, weeks)
+    ]
+    training_rows = []
+    exercise_rows = []
+    for training_id, (week_id, training) in zip(training_ids, trainings):
+        training_rows.append(
+            {
+                "id": training_id,
+                "name": training["name"],
+                "startTime": training.get("startTime") or default_time,
+                "endTime": training.get("endTime") or default_time,
+                "intensity": training["intensity"],
+                "planWeekId": week_id,
+                "planId": new_plan.id,
+                "userId": user_id,
+            }
+        )
+        for exercise in training["exercises"]:
+            exercise_rows.append(
+                {
+                    "intensity": exercise["intensity"],
+                    "minReps": exercise["minReps"],
+                    "maxReps": exercise["maxReps"],
+                    "minSets": exercise["minSets"],
+                    "maxSets": exercise["maxSets"],
+                    "exerciseId": exercise["exerciseId"],
+                    "planTrainingId": training_id,
+                    "planId": new_plan.id,
+                    "userId": user_id,
+                }
+            )
+
+    if week_rows:
+        await tx.planweek.create_many(data=week_rows)
+    if training_rows:
+        await tx.plantraining.create_many(data=training_rows)
+    if exercise_rows:
+        await tx.planexercise.create_many(data=exercise_rows)
+    return new_plan
+
 
 @router.post("/", response_model=PlanResponse, status_code=status.HTTP_201_CREATED)
 async def create_plan(
@@ -14,7 +112,6 @@ async def create_plan(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    from datetime import datetime
     new_plan = await db.plan.create(
         data={
             "name": plan.name,
@@ -26,13 +123,63 @@ async def create_plan(
     return new_plan
 
 
+@router.post(
+    "/full", response_model=PlanTreeResponse, status_code=status.HTTP_201_CREATED
+)
+async def create_full_plan(
+    plan: PlanFullCreate,
+    current_user=Depends(get_current_user),
+    db: Prisma = Depends(get_db),
+):
+    # Verify every referenced exercise is accessible, in one query
+    exercise_ids = {
+        exercise.exerciseId
+        for week in plan.weeks
+        for training in week.trainings
+        for exercise in training.exercises
+    }
+    if exercise_ids:
+        accessible = await db.exercise.find_many(
+            where={
+                "id": {"in": list(exercise_ids)},
+                "OR": [{"userId": current_user.id}, {"public": True}],
+            }
+        )
+        missing = exercise_ids - {exercise.id for exercise in accessible}
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Exercise not found: {', '.join(map(str, sorted(missing)))}",
+            )
+
+    plan_data = plan.model_dump(include={"name", "startDate", "public"})
+    if not plan_data["startDate"]:
+        plan_data["startDate"] = datetime.now()
+
+    async with db.tx() as tx:
+        new_plan = await _create_plan_tree(
+            tx, current_user.id, plan_data, plan.model_dump()["weeks"]
+        )
+
+    # Read the tree back so the client gets every generated id
+    return await db.plan.find_unique(where={"id": new_plan.id}, include=TREE_INCLUDE)
+
+
 @router.get("/", response_model=List[PlanResponse])
 async def get_plans(
-    current_user=Depends(get_current_user), db: Prisma = Depends(get_db)
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user=Depends(get_current_user),
+    db: Prisma = Depends(get_db),
 ):
-    # Get user's plans and public plans
-    plans = await db.plan.find_many(
-        where={"OR": [{"userId": current_user.id}, {"public": True}]}
+    # Get user's plans and public plans, one page at a time
+    plans = await paginate(
+        db.plan,
+        response,
+        where={"OR": [{"userId": current_user.id}, {"public": True}]},
+        limit=limit,
+        cursor=cursor,
     )
     return plans
 
@@ -52,6 +199,78 @@ async def get_plan(
     return plan
 
 
+@router.get("/{plan_id}/tree", response_model=PlanTreeResponse)
+async def get_plan_tree(
+    plan_id: int, current_user=Depends(get_current_user), db: Prisma = Depends(get_db)
+):
+    # Whole plan (weeks -> trainings -> exercises) in one nested query, with
+    # the same owner-or-public visibility as get_plan
+    plan = await db.plan.find_first(
+        where={"id": plan_id, "OR": [{"userId": current_user.id}, {"public": True}]},
+        include=TREE_INCLUDE,
+    )
+    if not plan:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Plan not found"
+        )
+    return plan
+
+
+@router.post(
+    "/{plan_id}/clone", response_model=PlanResponse, status_code=status.HTTP_201_CREATED
+)
+async def clone_plan(
+    plan_id: int, current_user=Depends(get_current_user), db: Prisma = Depends(get_db)
+):
+    # Any plan the user can see (own or public) can be copied
+    plan = await db.plan.find_first(
+        where={"id": plan_id, "OR": [{"userId": current_user.id}, {"public": True}]},
+        include={"weeks": {"include": {"trainings": {"include": {"exercises": True}}}}},
+    )
+    if not plan:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Plan not found"
+        )
+
+    weeks = [
+        {
+            "startDate": week.startDate,
+            "trainings": [
+                {
+                    **training.model_dump(
+                        include={"name", "startTime", "endTime", "intensity"}
+                    ),
+                    "exercises": [
+                        exercise.model_dump(
+                            include={
+                                "intensity",
+                                "minReps",
+                                "maxReps",
+                                "minSets",
+                                "maxSets",
+                                "exerciseId",
+                            }
+                        )
+                        for exercise in training.exercises or []
+                    ],
+                }
+                for training in week.trainings or []
+            ],
+        }
+        for week in plan.weeks or []
+    ]
+
+    # The copy is private to the user until they publish it
+    async with db.tx() as tx:
+        new_plan = await _create_plan_tree(
+            tx,
+            current_user.id,
+            {"name": plan.name, "startDate": plan.startDate, "public": False},
+            weeks,
+        )
+    return new_plan
+
+
 @router.put("/{plan_id}", response_model=PlanResponse)
 async def update_plan(
     plan_id: int,
@@ -59,16 +278,15 @@ async def update_plan(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    # Check if plan exists and belongs to user
-    plan = await db.plan.find_first(where={"id": plan_id, "userId": current_user.id})
-    if not plan:
+    # Update plan only if it belongs to user
+    update_data = plan_data.model_dump(exclude_unset=True)
+    updated_plan = await update_owned(
+        db, Plan, "plans", plan_id, current_user.id, update_data
+    )
+    if not updated_plan:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan not found"
         )
-
-    # Update plan
-    update_data = plan_data.model_dump(exclude_unset=True)
-    updated_plan = await db.plan.update(where={"id": plan_id}, data=update_data)
     return updated_plan
 
 
@@ -76,12 +294,21 @@ async def update_plan(
 async def delete_plan(
     plan_id: int, current_user=Depends(get_current_user), db: Prisma = Depends(get_db)
 ):
-    # Check if plan exists and belongs to user
-    plan = await db.plan.find_first(where={"id": plan_id, "userId": current_user.id})
-    if not plan:
+    # Sets go with the plan by cascade; remember their exercises and days first
+    days = await rollups.exercise_days(
+        db, current_user.id, 'pe."planId" = $2', plan_id
+    )
+
+    # Delete plan only if it belongs to user
+    deleted = await db.plan.delete_many(
+        where={"id": plan_id, "userId": current_user.id}
+    )
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Plan not found"
         )
-
-    await db.plan.delete(where={"id": plan_id})
+    await rollups.refresh_days(db, current_user.id, days)
+    await records.refresh_exercises(
+        db, current_user.id, [exercise_id for exercise_id, _ in days]
+    )
     return None
@@ -0,0 +1,42 @@
+from itertools import groupby
+from typing import List, Optional
+
+from app.database import get_current_user, get_db
+from app.records import estimated_1rm
+from app.schemas import ExerciseRecordsResponse
+from fastapi import APIRouter, Depends, Query
+from prisma import Prisma
+
+router = APIRouter(prefix="/records", tags=["Personal Records"])
+
+
+@router.get("/", response_model=List[ExerciseRecordsResponse])
+async def get_records(
+    exercise_id: Optional[int] = Query(None, description="Only this exercise"),
+    current_user=Depends(get_current_user),
+    db: Prisma = Depends(get_db),
+):
+    """Personal records per exercise: heaviest set, best estimated 1RM and the
+    most reps done at each weight (heaviest first)."""
+    where = {"userId": current_user.id}
+    if exercise_id is not None:
+        where["exerciseId"] = exercise_id
+
+    rows = await db.personalrecord.find_many(
+        where=where, order=[{"exerciseId": "asc"}, {"kgs": "desc"}]
+    )
+
+    results = []
+    for ex_id, group in groupby(rows, key=lambda row: row.exerciseId):
+        at_weight = list(group)
+        best = max(at_weight, key=lambda row: estimated_1rm(row.kgs, row.reps))
+        results.append(
+            {
+                "exerciseId": ex_id,
+                "heaviest": at_weight[0],
+                "bestEstimated1RM": best,
+                "estimated1RM": estimated_1rm(best.kgs, best.reps),
+                "repsAtWeight": at_weight,
+            }
+        )
+    return results
@@ -0,0 +1,150 @@
+from app import records, rollups
+from app.database import get_current_user, get_db
+from app.schemas import SessionUpload, SessionUploadResponse
+from fastapi import APIRouter, Depends, HTTPException, status
+from prisma import Prisma
+
+router = APIRouter(prefix="/sync", tags=["Sync"])
+
+
+@router.post("/session", response_model=SessionUploadResponse)
+async def upload_session(
+    session: SessionUpload,
+    current_user=Depends(get_current_user),
+    db: Prisma = Depends(get_db),
+):
+    """Store a whole training session recorded offline, in one transaction.
+
+    Every row carries a client-generated ``clientId``; rows already stored by
+    an earlier attempt are skipped, so the upload can be retried until the
+    client sees a response. The counts only include newly stored rows.
+    """
+    # Verify plan training belongs to user
+    plan_training = await db.plantraining.find_first(
+        where={"id": session.planTrainingId, "userId": current_user.id}
+    )
+    if not plan_training:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Plan training not found"
+        )
+
+    # Verify all plan exercises belong to the plan training, in one query
+    plan_exercise_ids = {item.planExerciseId for item in session.sets} | {
+        item.planExerciseId for item in session.decliningExercises
+    }
+    if plan_exercise_ids:
+        plan_exercises = await db.planexercise.find_many(
+            where={
+                "id": {"in": list(plan_exercise_ids)},
+                "planTrainingId": session.planTrainingId,
+            }
+        )
+        if len(plan_exercises) != len(plan_exercise_ids):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Plan exercise does not belong to this training's plan",
+            )
+
+    async with db.tx() as tx:
+        training = await tx.training.upsert(
+            where={
+                "userId_clientId": {
+                    "userId": current_user.id,
+                    "clientId": session.clientId,
+                }
+            },
+            data={
+                "create": {
+                    "clientId": session.clientId,
+                    "startTime": session.startTime,
+                    "endTime": session.endTime,
+                    "planTrainingId": session.planTrainingId,
+                    "userId": current_user.id,
+                },
+                "update": {"endTime": session.endTime},
+            },
+        )
+        if training.planTrainingId != session.planTrainingId:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Session was already uploaded for another plan training",
+            )
+
+        sets_created = 0
+        if session.sets:
+            sets_created = await tx.trainingexercise.create_many(
+                data=[
+                    {
+                        "clientId": item.clientId,
+                        "reps": item.reps,
+                        "kgs": item.kgs,
+                        "timestamp": item.timestamp,
+                        "trainingId": training.id,
+                        "planExerciseId": item.planExerciseId,
+                        "userId": current_user.id,
+                    }
+                    for item in session.sets
+                ],
+                skip_duplicates=True,
+            )
+
+        declining_created = 0
+        positions_created = 0
+        if session.decliningExercises:
+            declining_created = await tx.decliningtrainingexercise.create_many(
+                data=[
+                    {
+                        "clientId": item.clientId,
+                        "timestamp": item.timestamp,
+                        "planExerciseId": item.planExerciseId,
+                        "userId": current_user.id,
+                    }
+                    for item in session.decliningExercises
+                ],
+                skip_duplicates=True,
+            )
+
+            # Positions need the ids of declining exercises stored now or earlier
+            stored = await tx.decliningtrainingexercise.find_many(
+                where={
+                    "userId": current_user.id,
+                    "clientId": {
+                        "in": [item.clientId for item in session.decliningExercises]
+                    },
+                }
+            )
+            declining_ids = {row.clientId: row.id for row in stored}
+            positions = [
+                {
+                    "clientId": position.clientId,
+                    "kgs": position.kgs,
+                    "reps": position.reps,
+                    "decliningExerciseId": declining_ids[item.clientId],
+                    "userId": current_user.id,
+                }
+                for item in session.decliningExercises
+                for position in item.positions
+            ]
+            if positions:
+                positions_created = (
+                    await tx.decliningtrainingexerciseposition.create_many(
+                        data=positions, skip_duplicates=True
+                    )
+                )
+
+    # Recomputed rather than added to, since retried sets were skipped
+    await rollups.refresh(
+        db,
+        current_user.id,
+        [(item.planExerciseId, item.timestamp) for item in session.sets],
+    )
+    await records.refresh(
+        db, current_user.id, [item.planExerciseId for item in session.sets]
+    )
+
+    return {
+        "training": training,
+        "setsCreated": sets_created,
+        "decliningExercisesCreated": declining_created,
+        "positionsCreated": positions_created,
+    }
@@ -1,13 +1,20 @@
-from typing import List
+from typing import List, Optional
 
+from app import records, rollups
 from app.database import get_current_user, get_db
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from app.queries import delete_owned, reserve_ids, update_owned
 from app.schemas import (
+    TrainingExerciseBatchCreate,
+    TrainingExerciseBatchResponse,
     TrainingExerciseCreate,
     TrainingExerciseResponse,
     TrainingExerciseUpdate,
 )
-from fastapi import APIRouter, Depends, HTTPException, status
+from app.write_behind import create_set
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from prisma import Prisma
+from prisma.models import TrainingExercise
 
 router = APIRouter(prefix="/training-exercises", tags=["Training Exercises"])
 
@@ -21,20 +28,17 @@ async def create_training_exercise(
     db: Prisma = Depends(get_db),
 ):
     # Verify training belongs to user
-    training = await db.training.find_unique(
-        where={"id": training_exercise.trainingId},
-        include={
-            "planTraining": {"include": {"planWeek": {"include": {"plan": True}}}}
-        },
+    training = await db.training.find_first(
+        where={"id": training_exercise.trainingId, "userId": current_user.id}
     )
-    if not training or training.planTraining.planWeek.plan.userId != current_user.id:
+    if not training:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Training not found"
         )
 
     # Verify plan exercise belongs to the same plan training
     plan_exercise = await db.planexercise.find_unique(
-        where={"id": training_exercise.planExerciseId}, include={"planTraining": True}
+        where={"id": training_exercise.planExerciseId}
     )
     if not plan_exercise or plan_exercise.planTrainingId != training.planTrainingId:
         raise HTTPException(
@@ -42,38 +46,113 @@ async def create_training_exercise(
             detail="Plan exercise does not belong to this training's plan",
         )
 
-    new_training_exercise = await db.trainingexercise.create(
-        data={
-            "reps": training_exercise.reps,
-            "kgs": training_exercise.kgs,
-            "timestamp": training_exercise.timestamp,
-            "trainingId": training_exercise.trainingId,
-            "planExerciseId": training_exercise.planExerciseId,
-        }
+    data = {
+        "reps": training_exercise.reps,
+        "kgs": training_exercise.kgs,
+        "timestamp": training_exercise.timestamp,
+        "trainingId": training_exercise.trainingId,
+        "planExerciseId": training_exercise.planExerciseId,
+        "userId": current_user.id,
+    }
+    return await create_set(db, data)
+
+
+@router.post(
+    "/batch",
+    response_model=TrainingExerciseBatchResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_training_exercises_batch(
+    batch: TrainingExerciseBatchCreate,
+    current_user=Depends(get_current_user),
+    db: Prisma = Depends(get_db),
+):
+    # Verify training belongs to user
+    training = await db.training.find_first(
+        where={"id": batch.trainingId, "userId": current_user.id}
     )
-    return new_training_exercise
+    if not training:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Training not found"
+        )
+
+    # Verify all plan exercises belong to the same plan training, in one query
+    plan_exercise_ids = {item.planExerciseId for item in batch.sets}
+    valid_ids = set()
+    if plan_exercise_ids:
+        plan_exercises = await db.planexercise.find_many(
+            where={
+                "id": {"in": list(plan_exercise_ids)},
+                "planTrainingId": training.planTrainingId,
+            }
+        )
+        valid_ids = {plan_exercise.id for plan_exercise in plan_exercises}
+
+    # Items that fail validation are reported; the rest are still inserted
+    valid_items = []
+    errors = []
+    for index, item in enumerate(batch.sets):
+        if item.planExerciseId in valid_ids:
+            valid_items.append(item)
+        else:
+            errors.append(
+                {
+                    "index": index,
+                    "detail": "Plan exercise does not belong to this training's plan",
+                }
+            )
+
+    # Known ids let the rows be read back after a single bulk insert
+    ids = await reserve_ids(db, "training_exercises", len(valid_items))
+    created = []
+    if ids:
+        await db.trainingexercise.create_many(
+            data=[
+                {
+                    "id": set_id,
+                    "reps": item.reps,
+                    "kgs": item.kgs,
+                    "timestamp": item.timestamp,
+                    "trainingId": batch.trainingId,
+                    "planExerciseId": item.planExerciseId,
+                    "userId": current_user.id,
+                }
+                for set_id, item in zip(ids, valid_items)
+            ]
+        )
+        await rollups.add_sets(db, ids)
+        await records.add_sets(db, ids)
+        created = await db.trainingexercise.find_many(
+            where={"id": {"in": ids}}, order={"id": "asc"}
+        )
+    return {"created": created, "errors": errors}
 
 
 @router.get("/training/{training_id}", response_model=List[TrainingExerciseResponse])
 async def get_training_exercises_by_training(
     training_id: int,
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
     # Verify training belongs to user
-    training = await db.training.find_unique(
-        where={"id": training_id},
-        include={
-            "planTraining": {"include": {"planWeek": {"include": {"plan": True}}}}
-        },
+    training = await db.training.find_first(
+        where={"id": training_id, "userId": current_user.id}
     )
-    if not training or training.planTraining.planWeek.plan.userId != current_user.id:
+    if not training:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Training not found"
         )
 
-    training_exercises = await db.trainingexercise.find_many(
-        where={"trainingId": training_id}
+    training_exercises = await paginate(
+        db.trainingexercise,
+        response,
+        where={"trainingId": training_id},
+        limit=limit,
+        cursor=cursor,
+        order_by=("timestamp", "id"),
     )
     return training_exercises
 
@@ -84,23 +163,10 @@ async def get_training_exercise(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    training_exercise = await db.trainingexercise.find_unique(
-        where={"id": training_exercise_id},
-        include={
-            "training": {
-                "include": {
-                    "planTraining": {
-                        "include": {"planWeek": {"include": {"plan": True}}}
-                    }
-                }
-            }
-        },
+    training_exercise = await db.trainingexercise.find_first(
+        where={"id": training_exercise_id, "userId": current_user.id}
     )
-    if (
-        not training_exercise
-        or training_exercise.training.planTraining.planWeek.plan.userId
-        != current_user.id
-    ):
+    if not training_exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Training exercise not found"
         )
@@ -114,30 +180,32 @@ async def update_training_exercise(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    training_exercise = await db.trainingexercise.find_unique(
-        where={"id": training_exercise_id},
-        include={
-            "training": {
-                "include": {
-                    "planTraining": {
-                        "include": {"planWeek": {"include": {"plan": True}}}
-                    }
-                }
-            }
-        },
+    update_data = training_exercise_data.model_dump(exclude_unset=True)
+    updated_training_exercise = await update_owned(
+        db,
+        TrainingExercise,
+        "training_exercises",
+        training_exercise_id,
+        current_user.id,
+        update_data,
     )
-    if (
-        not training_exercise
-        or training_exercise.training.planTraining.planWeek.plan.userId
-        != current_user.id
-    ):
+    if not updated_training_exercise:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Training exercise not found"
         )
-
-    update_data = training_exercise_data.model_dump(exclude_unset=True)
-    updated_training_exercise = await db.trainingexercise.update(
-        where={"id": training_exercise_id}, data=update_data
+    await rollups.refresh(
+        db,
+        current_user.id,
+        [
+            (
+                updated_training_exercise.planExerciseId,
+                updated_training_exercise.timestamp,
+            )
+        ],
+    )
+    # A lowered weight or rep count can take a record away, so recompute
+    await records.refresh(
+        db, current_user.id, [updated_training_exercise.planExerciseId]
     )
     return updated_training_exercise
 
@@ -148,26 +216,20 @@ async def delete_training_exercise(
     current_user=Depends(get_current_user),
     db: Prisma = Depends(get_db),
 ):
-    training_exercise = await db.trainingexercise.find_unique(
-        where={"id": training_exercise_id},
-        include={
-            "training": {
-                "include": {
-                    "planTraining": {
-                        "include": {"planWeek": {"include": {"plan": True}}}
-                    }
-                }
-            }
-        },
+    # The deleted row is returned so its rollup day and records can be recomputed
+    deleted = await delete_owned(
+        db,
+        TrainingExercise,
+        "training_exercises",
+        training_exercise_id,
+        current_user.id,
     )
-    if (
-        not training_exercise
-        or training_exercise.training.planTraining.planWeek.plan.userId
-        != current_user.id
-    ):
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Training exercise not found"
         )
-
-    await db.trainingexercise.delete(where={"id": training_exercise_id})
+    await rollups.refresh(
+        db, current_user.id, [(deleted.planExerciseId, deleted.timestamp)]
+    )
+    await records.refresh(db, current_user.id, [deleted.planExerciseId])
     return None
@@ -1,9 +1,18 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from typing import List, Literal, Optional
 from datetime import datetime
 from prisma import Prisma
-from app.schemas import TrainingCreate, TrainingUpdate, TrainingResponse
+from prisma.models import Training
+from app.schemas import (
+    TrainingCreate,
+    TrainingUpdate,
+    TrainingResponse,
+    TrainingWithExercisesResponse,
+)
+from app import records, rollups
 from app.database import get_db, get_current_user
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate
+from app.queries import update_owned
 
 router = APIRouter(prefix="/trainings", tags=["Trainings"])
 
@@ -15,11 +24,10 @@ async def create_training(
     db: Prisma = Depends(get_db)
 ):
     # Verify plan training belongs to user
-    plan_training = await db.plantraining.find_unique(
-        where={"id": training.planTrainingId},
-        include={"planWeek": {"include": {"plan": True}}}
+    plan_training = await db.plantraining.find_first(
+        where={"id": training.planTrainingId, "userId": current_user.id}
     )
-    if not plan_training or plan_training.planWeek.plan.userId != current_user.id:
+    if not plan_training:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Plan training not found"
@@ -28,35 +36,68 @@ async def create_training(
     new_training = await db.training.create(
         data={
             "startTime": training.startTime if training.startTime else datetime.now(),
-            "planTrainingId": training.planTrainingId
+            "planTrainingId": training.planTrainingId,
+            "userId": current_user.id
         }
     )
     return new_training
 
 
-@router.get("/", response_model=List[TrainingResponse])
+@router.get(
+    "/",
+    response_model=List[TrainingWithExercisesResponse],
+    response_model_exclude_unset=True,
+)
 async def get_trainings(
+    response: Response,
+    start_from: Optional[datetime] = Query(
+        None, description="Only trainings starting at or after this time"
+    ),
+    start_to: Optional[datetime] = Query(
+        None, description="Only trainings starting before this time"
+    ),
+    order: Literal["asc", "desc"] = Query(
+        "asc", description="desc returns the most recent trainings first"
+    ),
+    include: Optional[Literal["exercises"]] = Query(
+        None, description="exercises adds each training's sets"
+    ),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
     current_user = Depends(get_current_user),
     db: Prisma = Depends(get_db)
 ):
-    # Get all trainings for user's plan trainings
-    trainings = await db.training.find_many(
-        where={
-            "planTraining": {
-                "is": {
-                    "planWeek": {
-                        "is": {
-                            "plan": {
-                                "is": {
-                                    "userId": current_user.id
-                                }
-                            }
-                        }
-                    }
-                }
-            }
+    # Every training is created with a startTime; rows without one (from
+    # before that default) cannot be placed in startTime order
+    start_time = {"not": None}
+    if start_from:
+        start_time["gte"] = start_from
+    if start_to:
+        start_time["lt"] = start_to
+    where = {"userId": current_user.id, "startTime": start_time}
+
+    # Sets of every training on the page are loaded by Prisma with one
+    # batched trainingId IN (...) query
+    extra = {}
+    if include == "exercises":
+        extra["include"] = {
+            "trainingExercises": {"order_by": [{"timestamp": "asc"}, {"id": "asc"}]}
         }
+
+    # Get the user's trainings in startTime order, one page at a time
+    trainings = await paginate(
+        db.training,
+        response,
+        where=where,
+        limit=limit,
+        cursor=cursor,
+        order_by=("startTime", "id"),
+        descending=order == "desc",
+        **extra
     )
+    if include != "exercises":
+        # Without the include, trainingExercises is left unset and so not listed
+        return [TrainingResponse.model_validate(training) for training in trainings]
     return trainings
 
 
@@ -66,11 +107,10 @@ async def get_training(
     current_user = Depends(get_current_user),
     db: Prisma = Depends(get_db)
 ):
-    training = await db.training.find_unique(
-        where={"id": training_id},
-        include={"planTraining": {"include": {"planWeek": {"include": {"plan": True}}}}}
+    training = await db.training.find_first(
+        where={"id": training_id, "userId": current_user.id}
     )
-    if not training or training.planTraining.planWeek.plan.userId != current_user.id:
+    if not training:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Training not found"
@@ -85,21 +125,15 @@ async def update_training(
     current_user = Depends(get_current_user),
     db: Prisma = Depends(get_db)
 ):
-    training = await db.training.find_unique(
-        where={"id": training_id},
-        include={"planTraining": {"include": {"planWeek": {"include": {"plan": True}}}}}
+    update_data = training_data.model_dump(exclude_unset=True)
+    updated_training = await update_owned(
+        db, Training, "trainings", training_id, current_user.id, update_data
     )
-    if not training or training.planTraining.planWeek.plan.userId != current_user.id:
+    if not updated_training:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Training not found"
         )
-    
-    update_data = training_data.model_dump(exclude_unset=True)
-    updated_training = await db.training.update(
-        where={"id": training_id},
-        data=update_data
-    )
     return updated_training
 
 
@@ -109,20 +143,15 @@ async def end_training(
     current_user = Depends(get_current_user),
     db: Prisma = Depends(get_db)
 ):
-    training = await db.training.find_unique(
-        where={"id": training_id},
-        include={"planTraining": {"include": {"planWeek": {"include": {"plan": True}}}}}
+    updated_training = await update_owned(
+        db, Training, "trainings", training_id, current_user.id,
+        {"endTime": datetime.now()}
     )
-    if not training or training.planTraining.planWeek.plan.userId != current_user.id:
+    if not updated_training:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Training not found"
         )
-    
-    updated_training = await db.training.update(
-        where={"id": training_id},
-        data={"endTime": datetime.now()}
-    )
     return updated_training
 
 
@@ -132,15 +161,20 @@ async def delete_training(
     current_user = Depends(get_current_user),
     db: Prisma = Depends(get_db)
 ):
-    training = await db.training.find_unique(
-        where={"id": training_id},
-        include={"planTraining": {"include": {"planWeek": {"include": {"plan": True}}}}}
+    # Sets are removed by the cascade; remember their rollup days first
+    sets = await db.trainingexercise.find_many(
+        where={"trainingId": training_id, "userId": current_user.id}
+    )
+    deleted = await db.training.delete_many(
+        where={"id": training_id, "userId": current_user.id}
     )
-    if not training or training.planTraining.planWeek.plan.userId != current_user.id:
+    if not deleted:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Training not found"
         )
-    
-    await db.training.delete(where={"id": training_id})
+    await rollups.refresh(
+        db, current_user.id, [(s.planExerciseId, s.timestamp) for s in sets]
+    )
+    await records.refresh(db, current_user.id, [s.planExerciseId for s in sets])
     return None
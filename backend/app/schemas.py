@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -142,6 +142,23 @@ class ExerciseResponse(ExerciseBase):
         from_attributes = True
 
 
+class ExerciseFields(BaseModel):
+    """ExerciseResponse with every field optional, for sparse fieldsets (?fields=)."""
+
+    id: Optional[int] = None
+    name: Optional[str] = None
+    description: Optional[str] = None
+    video: Optional[str] = None
+    image: Optional[str] = None
+    public: Optional[bool] = None
+    userId: Optional[int] = None
+    createdAt: Optional[datetime] = None
+    updatedAt: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 # PlanExercise Schemas
 class PlanExerciseBase(BaseModel):
     intensity: int
@@ -176,6 +193,25 @@ class PlanExerciseResponse(PlanExerciseBase):
         from_attributes = True
 
 
+class PlanExerciseFields(BaseModel):
+    """PlanExerciseResponse with every field optional, for sparse fieldsets (?fields=)."""
+
+    id: Optional[int] = None
+    intensity: Optional[int] = None
+    minReps: Optional[int] = None
+    maxReps: Optional[int] = None
+    minSets: Optional[int] = None
+    maxSets: Optional[int] = None
+    planTrainingId: Optional[int] = None
+    exerciseId: Optional[int] = None
+    exercise: Optional[ExerciseFields] = None
+    createdAt: Optional[datetime] = None
+    updatedAt: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+
 # Training Schemas
 class TrainingBase(BaseModel):
     startTime: Optional[datetime] = None
@@ -201,6 +237,11 @@ class TrainingResponse(TrainingBase):
         from_attributes = True
 
 
+class TrainingWithExercisesResponse(TrainingResponse):
+    # Only loaded, and only present, with GET /trainings/?include=exercises
+    trainingExercises: Optional[List["TrainingExerciseResponse"]] = None
+
+
 # TrainingExercise Schemas
 class TrainingExerciseBase(BaseModel):
     reps: int
@@ -229,6 +270,26 @@ class TrainingExerciseResponse(TrainingExerciseBase):
         from_attributes = True
 
 
+# Batch set logging Schemas (POST /training-exercises/batch)
+class TrainingExerciseBatchItem(TrainingExerciseBase):
+    planExerciseId: int
+
+
+class TrainingExerciseBatchCreate(BaseModel):
+    trainingId: int
+    sets: List[TrainingExerciseBatchItem]
+
+
+class BatchItemError(BaseModel):
+    index: int
+    detail: str
+
+
+class TrainingExerciseBatchResponse(BaseModel):
+    created: List[TrainingExerciseResponse] = []
+    errors: List[BatchItemError] = []
+
+
 # DecliningTrainingExercise Schemas
 class DecliningTrainingExerciseBase(BaseModel):
     timestamp: datetime
@@ -278,5 +339,134 @@ class DecliningTrainingExercisePositionResponse(DecliningTrainingExercisePositio
         from_attributes = True
 
 
+# Plan tree Schemas (GET /plans/{id}/tree)
+class PlanTrainingTreeResponse(PlanTrainingResponse):
+    exercises: List[PlanExerciseResponse] = []
+
+
+class PlanWeekTreeResponse(PlanWeekResponse):
+    trainings: List[PlanTrainingTreeResponse] = []
+
+
+class PlanTreeResponse(PlanResponse):
+    weeks: List[PlanWeekTreeResponse] = []
+
+
+# Nested plan Schemas (POST /plans/full)
+class PlanExerciseNestedCreate(PlanExerciseBase):
+    exerciseId: int
+
+
+class PlanTrainingNestedCreate(PlanTrainingBase):
+    exercises: List[PlanExerciseNestedCreate] = []
+
+
+class PlanWeekNestedCreate(PlanWeekBase):
+    trainings: List[PlanTrainingNestedCreate] = []
+
+
+class PlanFullCreate(PlanBase):
+    weeks: List[PlanWeekNestedCreate] = []
+
+
+# Session sync Schemas (POST /sync/session)
+class SessionSetUpload(TrainingExerciseBase):
+    clientId: str
+    planExerciseId: int
+
+
+class SessionDecliningPositionUpload(DecliningTrainingExercisePositionBase):
+    clientId: str
+
+
+class SessionDecliningUpload(DecliningTrainingExerciseBase):
+    clientId: str
+    planExerciseId: int
+    positions: List[SessionDecliningPositionUpload] = []
+
+
+class SessionUpload(BaseModel):
+    clientId: str
+    planTrainingId: int
+    startTime: datetime
+    endTime: Optional[datetime] = None
+    sets: List[SessionSetUpload] = []
+    decliningExercises: List[SessionDecliningUpload] = []
+
+
+class SessionUploadResponse(BaseModel):
+    training: TrainingResponse
+    setsCreated: int
+    decliningExercisesCreated: int
+    positionsCreated: int
+
+
+# Analytics Schemas
+class ExerciseProgressResponse(BaseModel):
+    exerciseId: int
+    period: datetime
+    volume: float
+    topSet: float
+    sets: int
+    reps: int
+    estimated1RM: float
+
+
+class DropSetStatsResponse(BaseModel):
+    decliningExerciseId: int
+    planExerciseId: int
+    timestamp: datetime
+    positions: int
+    volume: float
+    startKgs: float
+    endKgs: float
+    startReps: int
+    endReps: int
+    # Mean of each position's kgs / reps relative to the previous position;
+    # null for a drop set with a single position
+    avgKgsRatio: Optional[float] = None
+    avgRepsRatio: Optional[float] = None
+
+
+class PlanAdherenceResponse(BaseModel):
+    planId: int
+    planWeekId: int
+    weekStartDate: Optional[datetime] = None
+    planTrainingId: int
+    planExerciseId: int
+    exerciseId: int
+    intensity: int
+    minSets: int
+    maxSets: int
+    minReps: int
+    maxReps: int
+    # What was logged against the plan exercise
+    trainings: int
+    performedSets: int
+    performedReps: int
+    avgSetsPerTraining: Optional[float] = None
+    avgReps: Optional[float] = None
+    setsInRepRange: int
+
+
+# Personal record Schemas
+class PersonalRecordResponse(BaseModel):
+    kgs: float
+    reps: int
+    achievedAt: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class ExerciseRecordsResponse(BaseModel):
+    exerciseId: int
+    heaviest: PersonalRecordResponse
+    bestEstimated1RM: PersonalRecordResponse
+    estimated1RM: float
+    repsAtWeight: List[PersonalRecordResponse]
+
+
 # Update forward references
 PlanExerciseResponse.model_rebuild()
+TrainingWithExercisesResponse.model_rebuild()
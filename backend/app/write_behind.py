@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from app import records, rollups
+from app.config import settings
+from app.queries import reserve_ids
+from prisma import Prisma
+
+logger = logging.getLogger(__name__)
+
+DURABILITY_POLICIES = ("flush", "enqueue")
+
+
+class SetWriteBuffer:
+    """Write-behind buffer for logged sets (``training_exercises`` rows).
+
+    Validated rows are queued and written with one ``create_many`` every
+    ``flush_ms`` milliseconds, or as soon as ``max_rows`` are waiting. Ids are
+    handed out from blocks reserved from the table's sequence, so a row can be
+    returned to the client before it is written.
+
+    ``durability`` decides when ``add`` returns: ``"flush"`` waits until the
+    row's batch is committed (requests still share inserts), ``"enqueue"``
+    returns immediately, so rows queued when the process dies are lost.
+    """
+
+    def __init__(
+        self,
+        enabled: bool,
+        flush_ms: int,
+        max_rows: int,
+        durability: str,
+        id_block_size: int,
+    ):
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"Unknown write-behind durability policy: {durability}")
+        self.enabled = enabled
+        self.flush_ms = flush_ms
+        self.max_rows = max_rows
+        self.durability = durability
+        self.id_block_size = id_block_size
+        self._db: Optional[Prisma] = None
+        self._queue: List[Tuple[dict, Optional[asyncio.Future]]] = []
+        self._ids: List[int] = []
+        self._id_lock: Optional[asyncio.Lock] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._full: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_rows = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+
+    def start(self, db: Prisma):
+        if not self.enabled or self._task is not None:
+            return
+        self._db = db
+        self._id_lock = asyncio.Lock()
+        self._flush_lock = asyncio.Lock()
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the background flusher once everything queued is written."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._full.set()
+        await self._task
+        self._task = None
+        # Rows queued while the last flush ran, or before the task first ran
+        await self.flush()
+
+    async def _next_id(self) -> int:
+        async with self._id_lock:
+            if not self._ids:
+                self._ids = await reserve_ids(
+                    self._db, "training_exercises", self.id_block_size
+                )
+            return self._ids.pop(0)
+
+    async def add(self, data: dict) -> dict:
+        """Queue one row and return it as it will be stored (with its id)."""
+        now = datetime.now(timezone.utc)
+        row = {**data, "id": await self._next_id(), "createdAt": now, "updatedAt": now}
+
+        future = None
+        if self.durability == "flush":
+            future = asyncio.get_running_loop().create_future()
+        self._queue.append((row, future))
+        if len(self._queue) >= self.max_rows:
+            self._full.set()
+
+        if future is not None:
+            await future
+        return row
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self.flush_ms / 1000)
+            except asyncio.TimeoutError:
+                pass
+            self._full.clear()
+            await self.flush()
+
+    async def flush(self):
+        async with self._flush_lock:
+            while self._queue:
+                batch = self._queue[: self.max_rows]
+                del self._queue[: self.max_rows]
+                await self._write(batch)
+
+    async def _insert_rows(
+        self, batch: List[Tuple[dict, Optional[asyncio.Future]]]
+    ) -> List[Tuple[dict, Optional[asyncio.Future]]]:
+        """Insert ``batch`` and return the entries that were written.
+
+        One ``create_many`` normally; if it fails (e.g. one row references a
+        deleted training), the rows are retried one by one so only the
+        offending rows are lost and only their callers see the error.
+        """
+        try:
+            await self._db.trainingexercise.create_many(data=[row for row, _ in batch])
+            return batch
+        except Exception:
+            if len(batch) == 1:
+                raise
+            logger.warning(
+                "Write-behind flush of %d sets failed, retrying row by row", len(batch)
+            )
+
+        written = []
+        for row, future in batch:
+            try:
+                await self._db.trainingexercise.create_many(data=[row])
+            except Exception as exc:
+                self.failed_rows += 1
+                logger.exception("Write-behind insert of set %s failed", row["id"])
+                if future is not None and not future.done():
+                    future.set_exception(exc)
+                continue
+            written.append((row, future))
+        return written
+
+    async def _write(self, batch: List[Tuple[dict, Optional[asyncio.Future]]]):
+        started = time.perf_counter()
+        try:
+            written = await self._insert_rows(batch)
+        except Exception as exc:
+            self.failed_rows += len(batch)
+            logger.exception("Write-behind flush of %d sets failed", len(batch))
+            for _, future in batch:
+                if future is not None and not future.done():
+                    future.set_exception(exc)
+            return
+        if not written:
+            return
+
+        set_ids = [row["id"] for row, _ in written]
+        try:
+            await rollups.add_sets(self._db, set_ids)
+            await records.add_sets(self._db, set_ids)
+        except Exception:
+            # The sets are stored; rollups and records catch up on the next rebuild
+            logger.exception("Stats update for %d buffered sets failed", len(written))
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.flushes += 1
+        self.flushed_rows += len(written)
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        for _, future in written:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "durability": self.durability,
+            "queue_depth": len(self._queue),
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_rows": self.failed_rows,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_flush_ms": round(self.max_flush_ms, 2),
+        }
+
+
+set_write_buffer = SetWriteBuffer(
+    enabled=settings.SET_WRITE_BEHIND,
+    flush_ms=settings.SET_WRITE_BEHIND_FLUSH_MS,
+    max_rows=settings.SET_WRITE_BEHIND_MAX_ROWS,
+    durability=settings.SET_WRITE_BEHIND_DURABILITY,
+    id_block_size=settings.SET_WRITE_BEHIND_ID_BLOCK_SIZE,
+)
+
+
+async def create_set(db: Prisma, data: dict):
+    """Store one validated set (``training_exercises`` row) and add it to the
+    rollups and records; through ``set_write_buffer`` when it is enabled.
+
+    Returns the stored row, as a dict when it went through the buffer.
+    """
+    if set_write_buffer.enabled:
+        # Inserted together with other requests' sets by the write-behind buffer
+        return await set_write_buffer.add(data)
+
+    row = await db.trainingexercise.create(data=data)
+    await rollups.add_sets(db, [row.id])
+    await records.add_sets(db, [row.id])
+    return row
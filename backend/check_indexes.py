@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Index usage check
+Runs EXPLAIN for the query shape behind each list/ownership route and fails
+if any of them still needs a sequential scan.
+
+Sequential scans are disabled for the check transaction, so the planner only
+falls back to one when no usable index exists, even on a near-empty database.
+"""
+import asyncio
+import json
+import sys
+
+from app.pagination import DEFAULT_PAGE_SIZE
+from prisma import Prisma
+
+# Colors for output
+GREEN = "\033[92m"
+RED = "\033[91m"
+RESET = "\033[0m"
+BLUE = "\033[94m"
+
+# Example values of the pagination keys, used in the next-page shapes
+CURSOR_VALUES = {
+    "id": "100",
+    "name": "'Bench press'",
+    "startTime": "'2024-01-01'",
+    "timestamp": "'2024-01-01'",
+}
+
+
+def page_queries(route, table, where, order_by=("id",), descending=False):
+    """Query shapes sent by app.pagination.paginate for a list route: the first
+    page, and a later page with the keyset predicate built from the cursor."""
+    op, direction = ("<", "DESC") if descending else (">", "ASC")
+    branches = []
+    for i, field in enumerate(order_by):
+        parts = [f'"{key}" = {CURSOR_VALUES[key]}' for key in order_by[:i]]
+        parts.append(f'"{field}" {op} {CURSOR_VALUES[field]}')
+        branches.append(f"({' AND '.join(parts)})")
+
+    select = f'SELECT * FROM "{table}" WHERE ({where})'
+    order = ", ".join(f'"{field}" {direction}' for field in order_by)
+    tail = f"ORDER BY {order} LIMIT {DEFAULT_PAGE_SIZE + 1}"
+    return [
+        (route, f"{select} {tail}"),
+        (f"{route} (next page)", f"{select} AND ({' OR '.join(branches)}) {tail}"),
+    ]
+
+
+TRAININGS_WHERE = '"userId" = 1 AND "startTime" IS NOT NULL'
+
+# (route, query) pairs; literal ids are fine as only the plan shape matters
+QUERIES = [
+    *page_queries("GET /plans/", "plans", '"userId" = 1 OR "public" = true'),
+    *page_queries("GET /exercises/", "exercises", '"userId" = 1 OR "public" = true'),
+    *page_queries("GET /exercises/?filter_type=my", "exercises", '"userId" = 1'),
+    *page_queries(
+        "GET /exercises/?search=...",
+        "exercises",
+        '("userId" = 1 OR "public" = true) '
+        "AND (\"name\" ILIKE '%press%' OR \"description\" ILIKE '%press%')",
+        order_by=("name", "id"),
+    ),
+    (
+        "GET /plan-weeks/plan/{id}",
+        'SELECT * FROM "plan_weeks" WHERE "planId" = 1',
+    ),
+    (
+        "GET /plan-trainings/week/{id}",
+        'SELECT * FROM "plan_trainings" WHERE "planWeekId" = 1',
+    ),
+    (
+        "GET /plan-exercises/training/{id}",
+        'SELECT * FROM "plan_exercises" WHERE "planTrainingId" = 1',
+    ),
+    (
+        "DELETE /exercises/{id} (cascade)",
+        'SELECT * FROM "plan_exercises" WHERE "exerciseId" = 1',
+    ),
+    *page_queries(
+        "GET /trainings/", "trainings", TRAININGS_WHERE, order_by=("startTime", "id")
+    ),
+    *page_queries(
+        "GET /trainings/?order=desc",
+        "trainings",
+        TRAININGS_WHERE,
+        order_by=("startTime", "id"),
+        descending=True,
+    ),
+    *page_queries(
+        "GET /trainings/?start_from=...&start_to=...",
+        "trainings",
+        f"{TRAININGS_WHERE} "
+        "AND \"startTime\" >= '2024-01-01' AND \"startTime\" < '2024-02-01'",
+        order_by=("startTime", "id"),
+    ),
+    (
+        "GET /trainings/?include=exercises",
+        'SELECT * FROM "training_exercises" WHERE "trainingId" IN (1, 2, 3) '
+        'ORDER BY "timestamp" ASC, "id" ASC',
+    ),
+    (
+        "DELETE /plan-trainings/{id} (cascade)",
+        'SELECT * FROM "trainings" WHERE "planTrainingId" = 1',
+    ),
+    *page_queries(
+        "GET /training-exercises/training/{id}",
+        "training_exercises",
+        '"trainingId" = 1',
+        order_by=("timestamp", "id"),
+    ),
+    (
+        "GET /analytics/progress",
+        'SELECT * FROM "exercise_daily_rollups" WHERE "userId" = 1 AND "day" >= \'2024-01-01\'',
+    ),
+    (
+        "GET /analytics/drop-sets",
+        'SELECT * FROM "declining_training_exercises" WHERE "userId" = 1',
+    ),
+    (
+        "DELETE /plan-exercises/{id} (cascade)",
+        'SELECT * FROM "training_exercises" WHERE "planExerciseId" = 1',
+    ),
+    *page_queries(
+        "GET /declining-exercises/plan-exercise/{id}",
+        "declining_training_exercises",
+        '"planExerciseId" = 1',
+        order_by=("timestamp", "id"),
+    ),
+    *page_queries(
+        "GET /declining-exercises/{id}/positions",
+        "declining_training_exercise_positions",
+        '"decliningExerciseId" = 1',
+    ),
+]
+
+
+def find_seq_scans(node):
+    """Return the relations read with a sequential scan anywhere in the plan."""
+    scans = []
+    if node.get("Node Type") == "Seq Scan":
+        scans.append(node.get("Relation Name"))
+    for child in node.get("Plans", []):
+        scans.extend(find_seq_scans(child))
+    return scans
+
+
+async def explain(db, query):
+    async with db.tx() as tx:
+        await tx.execute_raw("SET LOCAL enable_seqscan = off")
+        rows = await tx.query_raw(f"EXPLAIN (FORMAT JSON) {query}")
+
+    plan = rows[0]["QUERY PLAN"]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return plan[0]["Plan"]
+
+
+async def main():
+    db = Prisma()
+    await db.connect()
+
+    failures = 0
+    try:
+        print(f"{BLUE}ℹ Checking index usage for {len(QUERIES)} queries...{RESET}\n")
+        for route, query in QUERIES:
+            scans = find_seq_scans(await explain(db, query))
+            if scans:
+                failures += 1
+                print(f"{RED}✗ {route}: sequential scan on {', '.join(scans)}{RESET}")
+            else:
+                print(f"{GREEN}✓ {route}{RESET}")
+    finally:
+        await db.disconnect()
+
+    print()
+    if failures:
+        print(f"{RED}✗ {failures} query shape(s) are not covered by an index{RESET}\n")
+        sys.exit(1)
+    print(f"{GREEN}✓ All query shapes use an index{RESET}\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,15 +1,29 @@
-from app.database import prisma
+from app.auth import password_hasher, token_cache
+from app.config import settings
+from app.database import prisma, revocation_list, user_cache
+from app.idempotency import (
+    REPLAYED_HEADER,
+    IdempotencyMiddleware,
+    MemoryIdempotencyStore,
+)
+from app.pagination import NEXT_CURSOR_HEADER
 from app.routes import (
+    analytics,
     auth,
     declining_exercises,
     exercises,
+    export,
+    live,
     plan_exercises,
     plan_trainings,
     plan_weeks,
     plans,
+    records,
+    sync,
     training_exercises,
     trainings,
 )
+from app.write_behind import set_write_buffer
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -19,6 +33,12 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Replay responses to retried POSTs (added before CORS so replays get CORS headers)
+idempotency_store = MemoryIdempotencyStore(
+    maxsize=settings.IDEMPOTENCY_CACHE_SIZE, ttl=settings.IDEMPOTENCY_TTL_SECONDS
+)
+app.add_middleware(IdempotencyMiddleware, store=idempotency_store)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +46,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, REPLAYED_HEADER],
 )
 
 
@@ -33,11 +54,15 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup():
     await prisma.connect()
+    set_write_buffer.start(prisma)
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    # Write out buffered sets before the connection goes away
+    await set_write_buffer.stop()
     await prisma.disconnect()
+    password_hasher.shutdown()
 
 
 # Root endpoint
@@ -52,6 +77,19 @@ async def health_check():
     return {"status": "healthy"}
 
 
+# In-process cache and queue counters
+@app.get("/metrics")
+async def metrics():
+    return {
+        "token_cache": token_cache.stats(),
+        "user_cache": user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "revocation_list": revocation_list.stats(),
+        "idempotency": idempotency_store.stats(),
+        "set_write_buffer": set_write_buffer.stats(),
+    }
+
+
 # Include routers
 app.include_router(auth.router)
 app.include_router(plans.router)
@@ -60,8 +98,13 @@ app.include_router(plan_trainings.router)
 app.include_router(plan_exercises.router)
 app.include_router(exercises.router)
 app.include_router(trainings.router)
+app.include_router(live.router)
 app.include_router(training_exercises.router)
 app.include_router(declining_exercises.router)
+app.include_router(sync.router)
+app.include_router(analytics.router)
+app.include_router(records.router)
+app.include_router(export.router)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,42 @@
+-- Backfill the denormalized owner columns (planId / userId) on rows created
+-- before those columns existed. Only rows with a missing owner are touched, so
+-- this is safe to re-run after every `prisma db push`:
+--
+--   prisma db execute --file prisma/sql/backfill_owner_columns.sql --schema prisma/schema.prisma
+
+UPDATE "plan_trainings" AS pt
+SET "planId" = pw."planId", "userId" = p."userId"
+FROM "plan_weeks" AS pw
+JOIN "plans" AS p ON p."id" = pw."planId"
+WHERE pw."id" = pt."planWeekId"
+  AND (pt."planId" IS NULL OR pt."userId" IS NULL);
+
+UPDATE "plan_exercises" AS pe
+SET "planId" = pt."planId", "userId" = pt."userId"
+FROM "plan_trainings" AS pt
+WHERE pt."id" = pe."planTrainingId"
+  AND (pe."planId" IS NULL OR pe."userId" IS NULL);
+
+UPDATE "trainings" AS t
+SET "userId" = pt."userId"
+FROM "plan_trainings" AS pt
+WHERE pt."id" = t."planTrainingId"
+  AND t."userId" IS NULL;
+
+UPDATE "training_exercises" AS te
+SET "userId" = t."userId"
+FROM "trainings" AS t
+WHERE t."id" = te."trainingId"
+  AND te."userId" IS NULL;
+
+UPDATE "declining_training_exercises" AS d
+SET "userId" = pe."userId"
+FROM "plan_exercises" AS pe
+WHERE pe."id" = d."planExerciseId"
+  AND d."userId" IS NULL;
+
+UPDATE "declining_training_exercise_positions" AS dp
+SET "userId" = d."userId"
+FROM "declining_training_exercises" AS d
+WHERE d."id" = dp."decliningExerciseId"
+  AND dp."userId" IS NULL;
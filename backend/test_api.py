@@ -1,4 +1,28 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+
 import pytest
+from app.auth import (
+    PasswordHasher,
+    PasswordHasherBusy,
+    create_access_token,
+    decode_access_token,
+    token_cache,
+)
+from app.cache import LRUCache
+from app.database import RevocationList
+from app.fields import parse_fields
+from app.idempotency import (
+    IdempotencyMiddleware,
+    IdempotencyStore,
+    MemoryIdempotencyStore,
+)
+from app.pagination import decode_cursor, encode_cursor
+from app.routes.auth import _hasher_busy
+from app.schemas import ExerciseFields, PlanExerciseFields
+from app.write_behind import SetWriteBuffer
+from fastapi import FastAPI, HTTPException
 from fastapi.testclient import TestClient
 from main import app
 
@@ -167,3 +191,377 @@ def test_openapi_schema():
     assert "openapi" in schema
     assert "info" in schema
     assert schema["info"]["title"] == "Training App API"
+
+
+def test_cursor_round_trip():
+    """Test a pagination cursor decodes to the key values it was built from"""
+    values = [datetime(2024, 1, 1, 12, 30), 42]
+    assert decode_cursor(encode_cursor(values), 2) == values
+
+
+def test_invalid_cursor():
+    """Test malformed cursors, or cursors for another ordering, are rejected"""
+    for cursor in ["not-a-cursor", "%%%", encode_cursor([42])]:
+        with pytest.raises(HTTPException) as exc_info:
+            decode_cursor(cursor, 2)
+        assert exc_info.value.status_code == 400
+
+
+def test_parse_fields():
+    """Test sparse fieldsets add the pagination keys to the requested fields"""
+    assert parse_fields(None, ExerciseFields) is None
+    assert parse_fields("name, public", ExerciseFields) == {"id", "name", "public"}
+    assert parse_fields("exercise.name", PlanExerciseFields) == {"id", "exercise.name"}
+
+
+def test_parse_fields_unknown():
+    """Test unknown fields, including unknown nested fields, are rejected"""
+    for fields, model, unknown in [
+        ("name,colour", ExerciseFields, "colour"),
+        ("exercise.colour", PlanExerciseFields, "exercise.colour"),
+        ("intensity.value", PlanExerciseFields, "intensity.value"),
+    ]:
+        with pytest.raises(HTTPException) as exc_info:
+            parse_fields(fields, model)
+        assert exc_info.value.status_code == 400
+        assert exc_info.value.detail == f"Unknown fields: {unknown}"
+
+
+def make_idempotent_client(store):
+    """Client for a small app behind IdempotencyMiddleware that counts its calls.
+
+    ``POST /flaky`` fails with 503 on its first call only.
+    """
+    idempotent_app = FastAPI()
+    calls = {"items": 0, "flaky": 0}
+
+    @idempotent_app.post("/items", status_code=201)
+    def create_item(item: dict):
+        calls["items"] += 1
+        return {"call": calls["items"], **item}
+
+    @idempotent_app.post("/flaky", status_code=201)
+    def flaky():
+        calls["flaky"] += 1
+        if calls["flaky"] == 1:
+            raise HTTPException(status_code=503, detail="Try again")
+        return {"call": calls["flaky"]}
+
+    idempotent_app.add_middleware(IdempotencyMiddleware, store=store)
+    return TestClient(idempotent_app), calls
+
+
+IDEMPOTENT_HEADERS = {"Authorization": "Bearer token", "Idempotency-Key": "key-1"}
+
+
+def test_idempotency_replay():
+    """Test a retried POST gets the first response without running again"""
+    test_client, calls = make_idempotent_client(MemoryIdempotencyStore(100, 60))
+
+    first = test_client.post("/items", json={"name": "a"}, headers=IDEMPOTENT_HEADERS)
+    retry = test_client.post("/items", json={"name": "a"}, headers=IDEMPOTENT_HEADERS)
+    assert first.status_code == retry.status_code == 201
+    assert retry.json() == first.json() == {"call": 1, "name": "a"}
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert "Idempotent-Replayed" not in first.headers
+    assert calls["items"] == 1
+
+    # A new key, or another caller, runs the request again
+    other_key = {**IDEMPOTENT_HEADERS, "Idempotency-Key": "key-2"}
+    other_user = {**IDEMPOTENT_HEADERS, "Authorization": "Bearer other"}
+    for headers, call in [(other_key, 2), (other_user, 3)]:
+        response = test_client.post("/items", json={"name": "a"}, headers=headers)
+        assert response.json()["call"] == call
+
+
+def test_idempotency_different_body():
+    """Test reusing a key with a different request body is rejected"""
+    test_client, calls = make_idempotent_client(MemoryIdempotencyStore(100, 60))
+
+    test_client.post("/items", json={"name": "a"}, headers=IDEMPOTENT_HEADERS)
+    response = test_client.post(
+        "/items", json={"name": "b"}, headers=IDEMPOTENT_HEADERS
+    )
+    assert response.status_code == 422
+    assert calls["items"] == 1
+
+
+def test_idempotency_requires_auth():
+    """Test requests without an Authorization header are never replayed"""
+    test_client, calls = make_idempotent_client(MemoryIdempotencyStore(100, 60))
+    headers = {"Idempotency-Key": "key-1"}
+
+    test_client.post("/items", json={"name": "a"}, headers=headers)
+    response = test_client.post("/items", json={"name": "a"}, headers=headers)
+    assert response.json()["call"] == 2
+    assert "Idempotent-Replayed" not in response.headers
+
+
+def test_idempotency_in_progress():
+    """Test a retry arriving while the first request still runs gets 409"""
+    store = MemoryIdempotencyStore(100, 60)
+    test_client, calls = make_idempotent_client(store)
+    key = IdempotencyMiddleware(None, store)._key(b"Bearer token", "/items", b"key-1")
+    asyncio.run(store.acquire(key))
+
+    response = test_client.post(
+        "/items", json={"name": "a"}, headers=IDEMPOTENT_HEADERS
+    )
+    assert response.status_code == 409
+    assert calls["items"] == 0
+
+    asyncio.run(store.release(key))
+    response = test_client.post(
+        "/items", json={"name": "a"}, headers=IDEMPOTENT_HEADERS
+    )
+    assert response.status_code == 201
+
+
+def test_idempotency_server_error_not_stored():
+    """Test a 5xx response is not stored, so the retry runs the request"""
+    test_client, calls = make_idempotent_client(MemoryIdempotencyStore(100, 60))
+
+    assert test_client.post("/flaky", headers=IDEMPOTENT_HEADERS).status_code == 503
+    retry = test_client.post("/flaky", headers=IDEMPOTENT_HEADERS)
+    assert retry.status_code == 201
+    assert "Idempotent-Replayed" not in retry.headers
+    assert test_client.post("/flaky", headers=IDEMPOTENT_HEADERS).json() == {"call": 2}
+
+
+def test_idempotency_store_is_abstract():
+    """Test a store missing methods fails when it is created"""
+
+    class IncompleteStore(IdempotencyStore):
+        async def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        IncompleteStore()
+
+
+class FakeSetTable:
+    """Records the rows of each create_many; rows with negative reps fail"""
+
+    def __init__(self):
+        self.batches = []
+
+    async def create_many(self, data):
+        if any(row["reps"] < 0 for row in data):
+            raise ValueError("Invalid set")
+        self.batches.append([row["id"] for row in data])
+        return len(data)
+
+
+class FakeSetDb:
+    """Just enough of a Prisma client for SetWriteBuffer"""
+
+    def __init__(self):
+        self.trainingexercise = FakeSetTable()
+        self.next_id = 1
+
+    async def query_raw(self, query, count):
+        # Id block from the table's sequence
+        ids = range(self.next_id, self.next_id + count)
+        self.next_id += count
+        return [{"id": set_id} for set_id in ids]
+
+    async def execute_raw(self, query, *args):
+        # Rollup and personal record updates
+        return 0
+
+
+def make_set(reps=10):
+    return {"reps": reps, "kgs": 50.0, "timestamp": datetime.now(), "trainingId": 1}
+
+
+def test_write_buffer_flushes_when_full():
+    """Test a full queue is written at once, without waiting for the interval"""
+
+    async def run():
+        db = FakeSetDb()
+        buffer = SetWriteBuffer(True, 60_000, 3, "flush", 10)
+        buffer.start(db)
+        rows = await asyncio.wait_for(
+            asyncio.gather(*(buffer.add(make_set()) for _ in range(3))), timeout=5
+        )
+        await buffer.stop()
+        return db, buffer, rows
+
+    db, buffer, rows = asyncio.run(run())
+    assert [row["id"] for row in rows] == [1, 2, 3]
+    assert db.trainingexercise.batches == [[1, 2, 3]]
+    assert buffer.stats()["flushes"] == 1
+
+
+def test_write_buffer_flushes_on_stop():
+    """Test rows still queued are written when the buffer is stopped"""
+
+    async def run():
+        db = FakeSetDb()
+        buffer = SetWriteBuffer(True, 60_000, 100, "enqueue", 10)
+        buffer.start(db)
+        await buffer.add(make_set())
+        await buffer.add(make_set())
+        queued = list(db.trainingexercise.batches)
+        await buffer.stop()
+        return db, buffer, queued
+
+    db, buffer, queued = asyncio.run(run())
+    assert queued == []
+    assert db.trainingexercise.batches == [[1, 2]]
+    assert buffer.stats()["queue_depth"] == 0
+
+
+def test_write_buffer_fails_only_bad_rows():
+    """Test a failing row in a batch only fails its own caller"""
+
+    async def run():
+        db = FakeSetDb()
+        buffer = SetWriteBuffer(True, 60_000, 3, "flush", 10)
+        buffer.start(db)
+        results = await asyncio.gather(
+            buffer.add(make_set()),
+            buffer.add(make_set(reps=-1)),
+            buffer.add(make_set()),
+            return_exceptions=True,
+        )
+        await buffer.stop()
+        return db, buffer, results
+
+    db, buffer, results = asyncio.run(run())
+    assert isinstance(results[1], ValueError)
+    assert [result["id"] for result in (results[0], results[2])] == [1, 3]
+    assert db.trainingexercise.batches == [[1], [3]]
+    assert buffer.stats()["flushed_rows"] == 2
+    assert buffer.stats()["failed_rows"] == 1
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test the least recently used entry is evicted once the cache is full"""
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1}
+
+
+def test_lru_cache_expiry(monkeypatch):
+    """Test entries expire after the TTL, or earlier at their own expiry"""
+    now = [1000.0]
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(maxsize=10, ttl=30)
+    cache.set("ttl", 1)
+    cache.set("early", 2, expires_at=1010.0)
+    cache.set("late", 3, expires_at=2000.0)
+
+    now[0] = 1010.0
+    assert cache.get("early") is None
+    assert cache.get("ttl") == 1
+    assert cache.get("late") == 3
+
+    # An explicit expiry never extends an entry past the TTL
+    now[0] = 1030.0
+    assert cache.get("ttl") is None
+    assert cache.get("late") is None
+    assert len(cache) == 0
+
+
+def test_password_hasher_rejects_when_busy():
+    """Test hashes beyond max_pending are rejected instead of queued"""
+    hasher = PasswordHasher("thread", workers=1, max_pending=1)
+
+    async def run():
+        first = asyncio.ensure_future(hasher.hash("first"))
+        # Let the first hash take the only slot
+        await asyncio.sleep(0)
+        with pytest.raises(PasswordHasherBusy):
+            await hasher.verify("second", "$2b$12$invalid")
+        return await first
+
+    try:
+        hashed = asyncio.run(run())
+    finally:
+        hasher.shutdown()
+    assert hashed.startswith("$2b$")
+    assert hasher.stats()["rejected"] == 1
+    assert hasher.stats()["pending"] == 0
+
+
+def test_password_hasher_busy_response():
+    """Test a busy hasher is reported as a retryable 503"""
+    exc = _hasher_busy()
+    assert exc.status_code == 503
+    assert exc.headers == {"Retry-After": "1"}
+
+
+class FakeUserDb:
+    """Returns the given users' token versions, counting the reloads"""
+
+    def __init__(self, token_versions):
+        self.token_versions = token_versions
+        self.loads = 0
+
+    async def query_raw(self, query):
+        self.loads += 1
+        return [
+            {"id": user_id, "tokenVersion": version}
+            for user_id, version in self.token_versions.items()
+        ]
+
+
+def test_revocation_list(monkeypatch):
+    """Test tokens older than the user's tokenVersion are revoked, and versions
+    are reloaded only once the list is stale"""
+    now = [1000.0]
+    monkeypatch.setattr("app.database.time.monotonic", lambda: now[0])
+    db = FakeUserDb({1: 2})
+    revocations = RevocationList(refresh_seconds=30)
+
+    async def run():
+        await revocations.refresh_if_stale(db)
+        assert revocations.is_revoked(1, 1)
+        assert not revocations.is_revoked(1, 2)
+        assert not revocations.is_revoked(2, 0)
+
+        # Revoked elsewhere: seen once the list is stale
+        db.token_versions = {1: 3}
+        now[0] = 1029.0
+        await revocations.refresh_if_stale(db)
+        assert db.loads == 1
+        assert not revocations.is_revoked(1, 2)
+        now[0] = 1030.0
+        await revocations.refresh_if_stale(db)
+        assert db.loads == 2
+        assert revocations.is_revoked(1, 2)
+
+        # Revoked in this process: seen at once
+        revocations.revoke(2, 1)
+        assert revocations.is_revoked(2, 0)
+
+    asyncio.run(run())
+
+
+def test_token_cache_capped_at_expiry(monkeypatch):
+    """Test a cached token payload is dropped when the token expires, even if
+    the cache TTL is longer"""
+    now = [1000.0]
+    monkeypatch.setattr("app.cache.time.monotonic", lambda: now[0])
+    token = create_access_token(
+        {"sub": "expiring", "uid": 1}, expires_delta=timedelta(seconds=10)
+    )
+    key = hashlib.sha256(token.encode()).digest()
+
+    payload = decode_access_token(token)
+    assert payload["sub"] == "expiring"
+    assert token_cache.get(key) == payload
+
+    # exp has whole seconds, so the entry lives between 9 and 10 seconds
+    now[0] = 1008.5
+    assert token_cache.get(key) == payload
+    now[0] = 1010.5
+    assert token_cache.get(key) is None
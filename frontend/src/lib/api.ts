@@ -36,4 +36,19 @@ api.interceptors.response.use(
 	}
 );
 
+// List endpoints return one page at a time; the cursor for the next page is
+// sent in this header and is absent on the last page
+const NEXT_CURSOR_HEADER = 'x-next-cursor';
+
+export async function getAllPages<T>(url: string, params: Record<string, string> = {}): Promise<T[]> {
+	const items: T[] = [];
+	let cursor: string | undefined;
+	do {
+		const response = await api.get<T[]>(url, { params: cursor ? { ...params, cursor } : params });
+		items.push(...response.data);
+		cursor = response.headers[NEXT_CURSOR_HEADER];
+	} while (cursor);
+	return items;
+}
+
 export default api;
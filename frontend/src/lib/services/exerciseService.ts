@@ -1,4 +1,4 @@
-import api from '$lib/api';
+import api, { getAllPages } from '$lib/api';
 
 export interface Exercise {
 	id: number;
@@ -30,13 +30,11 @@ export interface UpdateExerciseData {
 
 export const exerciseService = {
 	async getAll(search?: string, filterType?: 'my' | 'public'): Promise<Exercise[]> {
-		const params = new URLSearchParams();
-		if (search) params.append('search', search);
-		if (filterType) params.append('filter_type', filterType);
-		
-		const url = `/exercises/${params.toString() ? '?' + params.toString() : ''}`;
-		const response = await api.get<Exercise[]>(url);
-		return response.data;
+		const params: Record<string, string> = {};
+		if (search) params.search = search;
+		if (filterType) params.filter_type = filterType;
+
+		return getAllPages<Exercise>('/exercises/', params);
 	},
 
 	async getById(id: number): Promise<Exercise> {
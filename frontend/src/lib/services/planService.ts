@@ -1,4 +1,7 @@
-import api from '$lib/api';
+import api, { getAllPages } from '$lib/api';
+import type { PlanExercise } from '$lib/services/planExerciseService';
+import type { PlanTraining } from '$lib/services/planTrainingService';
+import type { PlanWeek } from '$lib/services/planWeekService';
 
 export interface Plan {
 	id: number;
@@ -10,6 +13,18 @@ export interface Plan {
 	updatedAt: string;
 }
 
+export interface PlanTrainingTree extends PlanTraining {
+	exercises: PlanExercise[];
+}
+
+export interface PlanWeekTree extends PlanWeek {
+	trainings: PlanTrainingTree[];
+}
+
+export interface PlanTree extends Plan {
+	weeks: PlanWeekTree[];
+}
+
 export interface CreatePlanData {
 	name: string;
 	startDate?: string | null;
@@ -24,8 +39,7 @@ export interface UpdatePlanData {
 
 export const planService = {
 	async getAll(): Promise<Plan[]> {
-		const response = await api.get<Plan[]>('/plans/');
-		return response.data;
+		return getAllPages<Plan>('/plans/');
 	},
 
 	async getById(id: number): Promise<Plan> {
@@ -33,6 +47,11 @@ export const planService = {
 		return response.data;
 	},
 
+	async getTree(id: number): Promise<PlanTree> {
+		const response = await api.get<PlanTree>(`/plans/${id}/tree`);
+		return response.data;
+	},
+
 	async create(data: CreatePlanData): Promise<Plan> {
 		const response = await api.post<Plan>('/plans/', data);
 		return response.data;
@@ -1,4 +1,4 @@
-import api from '$lib/api';
+import api, { getAllPages } from '$lib/api';
 
 export interface Training {
 	id: number;
@@ -35,8 +35,7 @@ export interface CreateTrainingExerciseData {
 
 export const trainingService = {
 	async getAll(): Promise<Training[]> {
-		const response = await api.get<Training[]>('/trainings/');
-		return response.data;
+		return getAllPages<Training>('/trainings/');
 	},
 
 	async getById(id: number): Promise<Training> {
@@ -60,8 +59,7 @@ export const trainingService = {
 
 	// Training exercises
 	async getExercises(trainingId: number): Promise<TrainingExercise[]> {
-		const response = await api.get<TrainingExercise[]>(`/training-exercises/training/${trainingId}`);
-		return response.data;
+		return getAllPages<TrainingExercise>(`/training-exercises/training/${trainingId}`);
 	},
 
 	async addExercise(data: CreateTrainingExerciseData): Promise<TrainingExercise> {